@@ -147,6 +147,78 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds map snapshots, feedback hints and metrics. The versions snapshots are keyed by live in
+# the database (VersionCounter) so bumps made by the reinforcement worker or seed_curriculum
+# reach every web process. Deployments running several processes should still point this to a
+# shared backend (Redis, Memcached) so snapshots and metrics are shared.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "meetflow"),
+    }
+}
+
+# Optional compact per-user progress representation (see UserProgressBitmap)
+PROGRESS_BITMAP_ENABLED = os.getenv("PROGRESS_BITMAP_ENABLED", "false").lower() == "true"
+
+
+# LLM client (see MeetFlowV1/llm.py). Read once when the process starts.
+
+OPENAI_API_BASE_URL = os.getenv("OPENAI_API_BASE_URL") or "https://api.openai.com/v1"
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL")
+# Comma-separated OpenAI-compatible upstreams, preferred first (defaults to OPENAI_API_BASE_URL).
+# A call still unanswered after LLM_HEDGE_DELAY seconds is hedged to the next upstream;
+# past the LLM_DEADLINE_* of its call site it is abandoned and the caller falls back.
+OPENAI_API_BASE_URLS = [
+    url.strip() for url in os.getenv("OPENAI_API_BASE_URLS", "").split(",") if url.strip()
+] or [OPENAI_API_BASE_URL]
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "2"))
+LLM_DEADLINE_FEEDBACK = float(os.getenv("LLM_DEADLINE_FEEDBACK", "8"))
+LLM_DEADLINE_REINFORCEMENT = float(os.getenv("LLM_DEADLINE_REINFORCEMENT", "40"))
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# The breaker opens when at least LLM_BREAKER_MIN_CALLS of the last LLM_BREAKER_WINDOW
+# calls were made and LLM_BREAKER_FAILURE_RATE of them failed; it stays open LLM_BREAKER_COOLDOWN seconds.
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# Estimated prompt tokens allowed per call site (see MeetFlowV1/prompts.py)
+LLM_PROMPT_BUDGET_FEEDBACK = int(os.getenv("LLM_PROMPT_BUDGET_FEEDBACK", "400"))
+LLM_PROMPT_BUDGET_REINFORCEMENT = int(os.getenv("LLM_PROMPT_BUDGET_REINFORCEMENT", "900"))
+
+# Shared reinforcement content (see ReinforcementCacheEntry): least recently used
+# entries are evicted past the size limit, entries older than the TTL are regenerated.
+REINFORCEMENT_CACHE_MAX_ENTRIES = int(os.getenv("REINFORCEMENT_CACHE_MAX_ENTRIES", "5000"))
+REINFORCEMENT_CACHE_TTL_DAYS = int(os.getenv("REINFORCEMENT_CACHE_TTL_DAYS", "30"))
+
+# Shared feedback hints (see FeedbackHintEntry): same size limit and TTL policy, with the
+# hottest hints also kept FEEDBACK_HINT_CACHE_SECONDS in the Django cache.
+FEEDBACK_HINT_MAX_ENTRIES = int(os.getenv("FEEDBACK_HINT_MAX_ENTRIES", "20000"))
+FEEDBACK_HINT_TTL_DAYS = int(os.getenv("FEEDBACK_HINT_TTL_DAYS", "30"))
+FEEDBACK_HINT_CACHE_SECONDS = int(os.getenv("FEEDBACK_HINT_CACHE_SECONDS", "3600"))
+
+# Reinforcement jobs run their feedback and content LLM calls concurrently on two bounded pools
+# (feedback, generations) of AI_FANOUT_WORKERS threads each; whatever is not back after
+# AI_JOB_DEADLINE seconds falls back (see MeetFlowV1/jobs.py).
+AI_JOB_DEADLINE = float(os.getenv("AI_JOB_DEADLINE", "45"))
+AI_FANOUT_WORKERS = int(os.getenv("AI_FANOUT_WORKERS", "4"))
+# Pending jobs for the same (module, exercise type) arriving within AI_BATCH_WINDOW seconds
+# share one reinforcement generation (at most AI_BATCH_MAX_JOBS per batch).
+AI_BATCH_WINDOW = float(os.getenv("AI_BATCH_WINDOW", "1.5"))
+AI_BATCH_MAX_JOBS = int(os.getenv("AI_BATCH_MAX_JOBS", "50"))
+
+# Bearer token for scraping /api/metrics/ (staff sessions can always read it)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -42,5 +42,10 @@ urlpatterns = [
     # Adaptive Learning V2
     path("api/units/<int:unit_id>/session/", UnitSessionView.as_view(), name="unit_session"),
     path("api/exercises/<int:exercise_id>/check/", ExerciseCheckView.as_view(), name="exercise_check"),
+    path("api/exercises/<int:exercise_id>/feedback/stream/", ExerciseFeedbackStreamView.as_view(), name="exercise_feedback_stream"),
+    path("api/reinforcement_jobs/<int:job_id>/", ReinforcementJobStatusView.as_view(), name="reinforcement_job_status"),
     path("api/user/stats/", UserStatsView.as_view(), name="user_stats"),
+
+    # Monitoring
+    path("api/metrics/", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,90 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from .models import MasterExercise, FeedbackHintEntry
+from .prompts import FEEDBACK_ERRORS, compact_errors
+
+# Exercise types with a handful of possible wrong answers (CODE answers are free-form)
+HINT_EXERCISE_TYPES = ('BLANKS', 'PARSONS', 'DEBUG', 'THEORY')
+HINT_CACHE_KEY = 'meetflow:feedback_hint:{exercise_id}:{signature}'
+
+
+def answers_signature(error_log):
+    """
+    Hash of the wrong answers the feedback prompt is built from, insensitive to case,
+    whitespace, order and repetitions.
+    """
+    answers = sorted({answer.lower() for answer in compact_errors(error_log, FEEDBACK_ERRORS)})
+    return hashlib.sha1(json.dumps(answers).encode()).hexdigest()
+
+
+def supports_hints(exercise):
+    # AI exercises belong to a single user: nothing to share
+    return isinstance(exercise, MasterExercise) and exercise.type in HINT_EXERCISE_TYPES
+
+
+def get_feedback_hint(exercise, error_log):
+    """
+    Returns the stored hint for the exercise and wrong answers, or None.
+    Served from the Django cache when possible, otherwise from FeedbackHintEntry.
+    """
+    if not supports_hints(exercise):
+        return None
+    signature = answers_signature(error_log)
+    cache_key = HINT_CACHE_KEY.format(exercise_id=exercise.id, signature=signature)
+    hint = cache.get(cache_key)
+    if hint is not None:
+        return hint
+
+    fresh_after = timezone.now() - timedelta(days=settings.FEEDBACK_HINT_TTL_DAYS)
+    entry = FeedbackHintEntry.objects.filter(
+        exercise=exercise,
+        answers_signature=signature,
+        created_at__gte=fresh_after
+    ).only('id', 'hint', 'created_at').first()
+    if entry is None:
+        return None
+
+    FeedbackHintEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    cache.set(cache_key, entry.hint, timeout=_cache_timeout(entry.created_at))
+    return entry.hint
+
+
+def store_feedback_hint(exercise, error_log, hint):
+    """
+    Stores LLM feedback for the exercise and wrong answers and evicts the least recently
+    used hints beyond FEEDBACK_HINT_MAX_ENTRIES.
+    """
+    if not supports_hints(exercise) or not hint:
+        return
+    signature = answers_signature(error_log)
+    FeedbackHintEntry.objects.update_or_create(
+        exercise=exercise,
+        answers_signature=signature,
+        defaults={'hint': hint, 'created_at': timezone.now(), 'last_used_at': timezone.now()}
+    )
+    cache.set(
+        HINT_CACHE_KEY.format(exercise_id=exercise.id, signature=signature),
+        hint, timeout=_cache_timeout(timezone.now())
+    )
+    evict_feedback_hints()
+
+
+def evict_feedback_hints(max_entries=None):
+    max_entries = settings.FEEDBACK_HINT_MAX_ENTRIES if max_entries is None else max_entries
+    stale_ids = list(
+        FeedbackHintEntry.objects.order_by('-last_used_at', '-id').values_list('id', flat=True)[max_entries:]
+    )
+    if stale_ids:
+        FeedbackHintEntry.objects.filter(id__in=stale_ids).delete()
+    return len(stale_ids)
+
+
+def _cache_timeout(created_at):
+    # Never serve a hint from the cache past its TTL
+    expires_at = created_at + timedelta(days=settings.FEEDBACK_HINT_TTL_DAYS)
+    return max(1, min(settings.FEEDBACK_HINT_CACHE_SECONDS, int((expires_at - timezone.now()).total_seconds())))
@@ -0,0 +1,177 @@
+import hashlib
+import threading
+from collections import defaultdict
+from django.db.models import Count
+from .models import Module, ModuleDependency, Unit, MasterExercise
+from .versioning import get_curriculum_version
+
+
+class CurriculumGraph:
+    """
+    Read-only, process-wide view of the master curriculum (Module.user=None and
+    ModuleDependency.user=None). It is built once per curriculum version.
+    Modules are stored in topological order and addressed by their rank
+    internally; the public helpers take and return database ids.
+    """
+
+    def __init__(self, version, modules, edges, units, exercise_counts):
+        """
+        modules: [(id, order, position_x, position_y)], edges: [(source_id, target_id)],
+        units: {module_id: unit_id}, exercise_counts: {unit_id: count}
+        """
+        self.version = version
+
+        order = {module_id: module_order for module_id, module_order, _, _ in modules}
+        positions = {module_id: (x, y) for module_id, _, x, y in modules}
+        ids = sorted(order, key=lambda module_id: (order[module_id], module_id))
+        self.module_ids = tuple(self._topological_order(ids, edges))
+        self.rank = {module_id: rank for rank, module_id in enumerate(self.module_ids)}
+
+        parents = [[] for _ in self.module_ids]
+        children = [[] for _ in self.module_ids]
+        self.edges = []
+        for source_id, target_id in edges:
+            if source_id in self.rank and target_id in self.rank:
+                parents[self.rank[target_id]].append(self.rank[source_id])
+                children[self.rank[source_id]].append(self.rank[target_id])
+                self.edges.append((source_id, target_id))
+        self.edges = tuple(self.edges)
+        self.parents = tuple(tuple(ranks) for ranks in parents)
+        self.children = tuple(tuple(ranks) for ranks in children)
+
+        self.positions = tuple(positions[module_id] for module_id in self.module_ids)
+        self.unit_ids = tuple(units.get(module_id) for module_id in self.module_ids)
+        self.exercise_counts = tuple(exercise_counts.get(unit_id, 0) for unit_id in self.unit_ids)
+
+        # Stable identifier of the graph contents, identical across processes
+        digest = hashlib.sha1()
+        digest.update(repr((self.module_ids, self.edges, self.unit_ids, self.exercise_counts)).encode())
+        self.fingerprint = digest.hexdigest()
+
+    @staticmethod
+    def _topological_order(ids, edges):
+        # Kahn's algorithm; ties are resolved by (order, id). Nodes of a cycle keep their order at the end.
+        position = {module_id: idx for idx, module_id in enumerate(ids)}
+        in_degree = {module_id: 0 for module_id in ids}
+        outgoing = defaultdict(list)
+        for source_id, target_id in edges:
+            if source_id in position and target_id in position:
+                outgoing[source_id].append(target_id)
+                in_degree[target_id] += 1
+
+        ready = [module_id for module_id in ids if in_degree[module_id] == 0]
+        result = []
+        while ready:
+            ready.sort(key=position.get, reverse=True)
+            module_id = ready.pop()
+            result.append(module_id)
+            for target_id in outgoing[module_id]:
+                in_degree[target_id] -= 1
+                if in_degree[target_id] == 0:
+                    ready.append(target_id)
+
+        if len(result) < len(ids):
+            seen = set(result)
+            result.extend(module_id for module_id in ids if module_id not in seen)
+        return result
+
+    @classmethod
+    def load(cls, version):
+        modules = list(Module.objects.filter(user=None).values_list('id', 'order', 'position_x', 'position_y'))
+        edges = list(
+            ModuleDependency.objects.filter(user=None).order_by('id').values_list('source_node_id', 'target_node_id')
+        )
+        units = dict(Unit.objects.filter(module__user=None).values_list('module_id', 'id'))
+        exercise_counts = {
+            row['unit_id']: row['total']
+            for row in MasterExercise.objects.filter(unit_id__in=units.values()).values('unit_id').annotate(total=Count('id'))
+        }
+        return cls(version, modules, edges, units, exercise_counts)
+
+    def __contains__(self, module_id):
+        return module_id in self.rank
+
+    def __len__(self):
+        return len(self.module_ids)
+
+    def parent_ids(self, module_id):
+        rank = self.rank.get(module_id)
+        return [] if rank is None else [self.module_ids[r] for r in self.parents[rank]]
+
+    def child_ids(self, module_id):
+        rank = self.rank.get(module_id)
+        return [] if rank is None else [self.module_ids[r] for r in self.children[rank]]
+
+    def unit_id(self, module_id):
+        rank = self.rank.get(module_id)
+        return None if rank is None else self.unit_ids[rank]
+
+    def exercise_count(self, module_id):
+        rank = self.rank.get(module_id)
+        return 0 if rank is None else self.exercise_counts[rank]
+
+    def position(self, module_id):
+        rank = self.rank.get(module_id)
+        return None if rank is None else self.positions[rank]
+
+    def for_user(self, user):
+        """
+        Returns the graph of a user: the master graph with the user's AI dependencies merged on top.
+        """
+        edges = list(
+            ModuleDependency.objects.filter(user=user).order_by('id').values_list(
+                'source_node_id', 'target_node_id', 'label', 'bypassed_source_id'
+            )
+        )
+        return UserGraph(self, edges)
+
+
+class UserGraph:
+    """
+    Per-user overlay (AI reinforcement edges) on top of the shared CurriculumGraph.
+    """
+
+    def __init__(self, master, edges):
+        """
+        edges: [(source_id, target_id, label, bypassed_source_id)]
+        """
+        self.master = master
+        self.edges = tuple((source_id, target_id) for source_id, target_id, _, _ in edges)
+        # (source_id, target_id) -> (label, bypassed_source_id), precomputed at injection time
+        self.edge_details = {
+            (source_id, target_id): (label, bypassed_source_id)
+            for source_id, target_id, label, bypassed_source_id in edges
+        }
+        self._parents = defaultdict(list)
+        self._children = defaultdict(list)
+        for source_id, target_id in self.edges:
+            self._parents[target_id].append(source_id)
+            self._children[source_id].append(target_id)
+
+    def parent_ids(self, module_id):
+        return self.master.parent_ids(module_id) + self._parents.get(module_id, [])
+
+    def child_ids(self, module_id):
+        return self.master.child_ids(module_id) + self._children.get(module_id, [])
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_curriculum_graph():
+    """
+    Returns the master curriculum graph, loading it lazily on first use and
+    again whenever the curriculum version changes. The version is read from the
+    database at the start of each request or job, so curriculum changes made by
+    another process (e.g. seed_curriculum) are picked up by the next request.
+    """
+    global _graph
+    version = get_curriculum_version()
+    graph = _graph
+    if graph is None or graph.version != version:
+        with _graph_lock:
+            if _graph is None or _graph.version != version:
+                _graph = CurriculumGraph.load(version)
+            graph = _graph
+    return graph
@@ -0,0 +1,293 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from .models import ReinforcementJob, ReinforcementBankEntry
+from .services import AIService, FEEDBACK_FALLBACK
+from .graph import get_curriculum_graph
+from .versioning import forget_curriculum_version
+from .reinforcement_cache import error_signature, store_reinforcement
+from .feedback_hints import get_feedback_hint, store_feedback_hint
+from .metrics import record_feedback_outcome, record_reinforcement_outcome
+
+logger = logging.getLogger(__name__)
+
+# A RUNNING job not updated for this long belongs to a dead worker and is picked up again
+JOB_LEASE = timedelta(minutes=5)
+ACTIVE_STATUSES = ['PENDING', 'RUNNING']
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(name):
+    # Threads only run LLM calls: every database access stays on the worker thread.
+    # Feedback and reinforcement generations use separate pools, so a large batch of
+    # feedback calls never queues ahead of the generation every job of the batch waits for.
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ThreadPoolExecutor(
+                    max_workers=settings.AI_FANOUT_WORKERS, thread_name_prefix=f'ai-{name}'
+                )
+    return pool
+
+
+def enqueue_reinforcement_job(user, exercise, module, error_log, is_ai=False, inject_module=True, include_feedback=True):
+    """
+    Queues the AI work of a stuck user instead of calling the LLM inside the request.
+    Single-flight: while a job for the same user and exercise is active it is returned
+    instead (the unique_active_*reinforcement_job constraints settle races).
+    """
+    lookup = {'ai_exercise': exercise} if is_ai else {'master_exercise': exercise}
+    for _ in range(3):
+        active = ReinforcementJob.objects.filter(user=user, status__in=ACTIVE_STATUSES, **lookup).first()
+        if active is not None:
+            # A job not started yet picks up the latest errors and whatever this request also needs
+            updates = {'error_log': list(error_log or [])}
+            if inject_module:
+                updates['inject_module'] = True
+            if include_feedback:
+                updates['include_feedback'] = True
+            ReinforcementJob.objects.filter(id=active.id, status='PENDING').update(**updates)
+            return active
+
+        try:
+            with transaction.atomic():
+                return ReinforcementJob.objects.create(
+                    user=user,
+                    module=module,
+                    exercise_type=exercise.type,
+                    ai_exercise=exercise if is_ai else None,
+                    master_exercise=None if is_ai else exercise,
+                    error_log=list(error_log or []),
+                    inject_module=inject_module,
+                    include_feedback=include_feedback
+                )
+        except IntegrityError:
+            # A concurrent request queued the same job first
+            continue
+    raise IntegrityError("Could not queue the reinforcement job")
+
+
+def claim_next_job():
+    """
+    Atomically takes the oldest pending job (or one abandoned by a dead worker).
+    SELECT ... FOR UPDATE SKIP LOCKED lets several workers poll the same table.
+    """
+    stale_before = timezone.now() - JOB_LEASE
+    with transaction.atomic():
+        job = (
+            ReinforcementJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status='PENDING') | Q(status='RUNNING', updated_at__lt=stale_before))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'RUNNING'
+        job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _future_result(future, name):
+    """
+    Returns (result, error message) of a fan-out call, treating an unfinished call as timed out.
+    """
+    if not future.done():
+        future.cancel()
+        return None, f"{name} timed out"
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, f"{name} failed: {str(e)}"
+
+
+def _merge_error_logs(error_logs, limit=5):
+    """
+    Recent distinct errors of every user in a batch, for one shared generation prompt.
+    """
+    merged = []
+    for error_log in error_logs:
+        for entry in error_log[-limit:]:
+            if entry not in merged:
+                merged.append(entry)
+    return merged[-limit:]
+
+
+def claim_batch(job):
+    """
+    Coalesces the pending jobs that need the same reinforcement content as `job`:
+    waits until AI_BATCH_WINDOW has elapsed since it was queued, then claims every
+    pending job for the same (module, exercise type). Returns the batch, `job` first.
+    """
+    window = settings.AI_BATCH_WINDOW
+    if not job.inject_module or window <= 0:
+        return [job]
+    # Banked content is served without an LLM call: nothing to wait for
+    if ReinforcementBankEntry.objects.filter(source_module_id=job.module_id, exercise_type=job.exercise_type).exists():
+        return [job]
+
+    remaining = (job.created_at + timedelta(seconds=window) - timezone.now()).total_seconds()
+    if remaining > 0:
+        time.sleep(min(remaining, window))
+
+    with transaction.atomic():
+        followers = list(
+            ReinforcementJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='PENDING', module_id=job.module_id, exercise_type=job.exercise_type, inject_module=True)
+            .exclude(id=job.id)
+            .order_by('created_at')[:settings.AI_BATCH_MAX_JOBS - 1]
+        )
+        if followers:
+            ReinforcementJob.objects.filter(id__in=[follower.id for follower in followers]).update(
+                status='RUNNING', updated_at=timezone.now()
+            )
+    if followers:
+        logger.info("Batching %s jobs for module %s (%s)", len(followers) + 1, job.module_id, job.exercise_type)
+    return [job] + followers
+
+
+def _generation_in_flight(job, batch):
+    """
+    Whether an older job claimed outside this batch will inject the reinforcement module
+    `job` would: same user, module and exercise type, failed on another exercise.
+    Only older jobs count, so of two jobs claimed at once exactly one generates.
+    """
+    return ReinforcementJob.objects.filter(
+        user_id=job.user_id, module_id=job.module_id, exercise_type=job.exercise_type,
+        status='RUNNING', inject_module=True, id__lt=job.id,
+        updated_at__gte=timezone.now() - JOB_LEASE
+    ).exclude(id__in=[other.id for other in batch]).exists()
+
+
+def process_job(job):
+    return process_batch([job])[0]
+
+
+def process_batch(jobs):
+    """
+    Runs the LLM calls of claimed jobs (all for the same module and exercise type)
+    and stores the outcome on each of them. Every feedback and at most one shared
+    reinforcement generation are requested in parallel under one deadline
+    (AI_JOB_DEADLINE); each user's module is then written in its own transaction.
+    """
+    deadline = time.monotonic() + settings.AI_JOB_DEADLINE
+    graph = get_curriculum_graph()
+    feedback_pool = _get_pool('feedback')
+
+    plans = []
+    for job in jobs:
+        try:
+            plan = {
+                'job': job, 'errors': [], 'content': None, 'inject': False,
+                'feedback': None, 'feedback_future': None
+            }
+            plan['signature'] = error_signature(job.error_log)
+            inject = job.inject_module and AIService.can_inject_reinforcement(job.user, job.module, job.exercise_type)
+            if inject and _generation_in_flight(job, jobs):
+                # An older job of the user (another exercise) is injecting this module: feedback only
+                record_reinforcement_outcome('duplicate')
+                inject = False
+            if inject:
+                plan['inject'] = True
+                plan['content'] = AIService.lookup_reinforcement_content(
+                    job.module, job.exercise_type, plan['signature'], graph
+                )
+            if job.include_feedback:
+                plan['feedback'] = get_feedback_hint(job.exercise, job.error_log)
+                if plan['feedback'] is not None:
+                    record_feedback_outcome('hint_hit')
+                else:
+                    plan['feedback_future'] = feedback_pool.submit(
+                        AIService.get_adaptive_feedback, job.exercise, job.error_log, use_hint_store=False
+                    )
+            plans.append(plan)
+        except Exception as e:
+            _fail_job(job, e)
+
+    # One generation is shared by every job that found no stored content
+    waiting = [plan for plan in plans if plan['inject'] and plan['content'] is None]
+    content_future = None
+    if waiting:
+        first_job = waiting[0]['job']
+        content_future = _get_pool('generation').submit(
+            AIService._generate_reinforcement_content,
+            first_job.module, first_job.exercise_type,
+            _merge_error_logs([plan['job'].error_log for plan in waiting])
+        )
+
+    futures = [plan['feedback_future'] for plan in plans if plan['feedback_future'] is not None]
+    if content_future is not None:
+        futures.append(content_future)
+    wait(futures, timeout=max(0, deadline - time.monotonic()))
+
+    if content_future is not None:
+        content, error = _future_result(content_future, "Reinforcement")
+        for plan in waiting:
+            if error:
+                plan['errors'].append(error)
+            else:
+                plan['content'] = content
+        if not error:
+            for signature in {plan['signature'] for plan in waiting}:
+                store_reinforcement(first_job.module, first_job.exercise_type, signature, graph, content)
+
+    for plan in plans:
+        job = plan['job']
+        try:
+            if plan['feedback_future'] is not None:
+                feedback, error = _future_result(plan['feedback_future'], "Feedback")
+                job.feedback = feedback or FEEDBACK_FALLBACK
+                if error:
+                    plan['errors'].append(error)
+                elif job.feedback != FEEDBACK_FALLBACK:
+                    store_feedback_hint(job.exercise, job.error_log, job.feedback)
+            elif plan['feedback'] is not None:
+                job.feedback = plan['feedback']
+
+            with transaction.atomic():
+                # Checked again: another job of the batch may have injected for the same user
+                if plan['inject'] and plan['content'] is not None and AIService.can_inject_reinforcement(
+                    job.user, job.module, job.exercise_type
+                ):
+                    job.result_module = AIService.create_reinforcement_module(
+                        job.user, job.module, job.exercise_type, plan['content'], graph
+                    )
+                job.error = '; '.join(plan['errors'])
+                job.status = 'DONE'
+                job.save(update_fields=['feedback', 'result_module', 'status', 'error', 'updated_at'])
+        except Exception as e:
+            _fail_job(job, e)
+    return jobs
+
+
+def _fail_job(job, e):
+    logger.error("Reinforcement job %s failed: %s", job.id, e, exc_info=e)
+    job.status = 'FAILED'
+    job.error = str(e)
+    job.result_module = None
+    job.save(update_fields=['feedback', 'result_module', 'status', 'error', 'updated_at'])
+
+
+def run_next_job():
+    """
+    Claims and processes one job, together with the pending jobs it can be batched with.
+    Returns the claimed job, or None when the queue is empty.
+    """
+    # Each job starts from the current curriculum, like a web request
+    forget_curriculum_version()
+    job = claim_next_job()
+    if job is None:
+        return None
+    process_batch(claim_batch(job))
+    return job
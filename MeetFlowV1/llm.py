@@ -0,0 +1,412 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+from django.conf import settings
+from .metrics import record_llm_call, record_time_to_first_token, record_llm_hedge, record_llm_deadline_exceeded
+
+logger = logging.getLogger(__name__)
+
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 4.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """
+    `outcome` classifies the failure for the metrics: http_error, transport_error, circuit_open or parse_error.
+    """
+
+    def __init__(self, message, outcome='http_error'):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+class CircuitOpenError(LLMError):
+
+    def __init__(self, message="LLM circuit is open"):
+        super().__init__(message, outcome='circuit_open')
+
+
+class LLMDeadlineError(LLMError):
+
+    def __init__(self, message="LLM call exceeded its deadline"):
+        super().__init__(message, outcome='transport_error')
+
+
+class CircuitBreaker:
+    """
+    Error-rate breaker over the last `window` calls. While open every call fails
+    immediately; after `cooldown` seconds a single probe call is let through and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, window, min_calls, failure_rate, cooldown):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                self._opened_at = None
+                self._outcomes.clear()
+            self._probing = False
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._opened_at is not None:
+                # Failed probe: stay open for another cooldown
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                logger.warning("LLM circuit opened: %s/%s recent calls failed", failures, len(self._outcomes))
+                self._opened_at = time.monotonic()
+
+
+class LLMClient:
+    """
+    Process-wide chat completions client: one pooled keep-alive httpx.Client,
+    separate connect/read timeouts, bounded retries with jittered backoff and
+    a circuit breaker in front of the upstream.
+    """
+
+    def __init__(self, base_url, api_key=None, model=None, connect_timeout=5.0, read_timeout=30.0,
+                 max_retries=2, max_connections=20, breaker=None, transport=None):
+        # Clean base_url
+        base_url = base_url.rstrip('/')
+        if base_url.endswith("/chat/completions"):
+            base_url = base_url[:-len("/chat/completions")]
+        self.url = f"{base_url}/chat/completions"
+        self.model = model
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker(window=20, min_calls=5, failure_rate=0.5, cooldown=30.0)
+
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+
+        self.http = httpx.Client(
+            headers=headers,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+            trust_env=False,
+        )
+        logger.debug("LLM client ready for %s (model %s)", self.url, model or 'default')
+
+    @classmethod
+    def from_settings(cls, base_url=None):
+        return cls(
+            base_url=base_url or settings.OPENAI_API_BASE_URL,
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.OPENAI_MODEL,
+            connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+            read_timeout=settings.LLM_READ_TIMEOUT,
+            max_retries=settings.LLM_MAX_RETRIES,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            breaker=CircuitBreaker(
+                window=settings.LLM_BREAKER_WINDOW,
+                min_calls=settings.LLM_BREAKER_MIN_CALLS,
+                failure_rate=settings.LLM_BREAKER_FAILURE_RATE,
+                cooldown=settings.LLM_BREAKER_COOLDOWN,
+            ),
+        )
+
+    def chat(self, messages, response_format_json=False, call_site='other'):
+        """
+        Returns the content of the first completion choice. Raises LLMError
+        (CircuitOpenError when failing fast) so callers can use their fallbacks.
+        Duration, token usage, retries and outcome are recorded under `call_site`.
+        """
+        payload = {"messages": messages}
+        if self.model:
+            payload["model"] = self.model
+        if response_format_json:
+            payload["response_format"] = {"type": "json_object"}
+
+        started = time.monotonic()
+        stats = {'retries': 0}
+        try:
+            data = self._post(payload, stats)
+            try:
+                content = data['choices'][0]['message']['content']
+            except (KeyError, IndexError, TypeError) as e:
+                raise LLMError(f"LLM Call failed: malformed response ({e}) | Body: {data}", outcome='parse_error')
+        except LLMError as e:
+            record_llm_call(call_site, e.outcome, time.monotonic() - started, model=self.model, retries=stats['retries'])
+            raise
+
+        usage = data.get('usage') or {}
+        record_llm_call(
+            call_site, 'success', time.monotonic() - started, model=self.model,
+            prompt_tokens=usage.get('prompt_tokens') or 0,
+            completion_tokens=usage.get('completion_tokens') or 0,
+            retries=stats['retries']
+        )
+        return content
+
+    def _post(self, payload, stats):
+        for attempt in range(self.max_retries + 1):
+            stats['retries'] = attempt
+            if not self.breaker.allow():
+                raise CircuitOpenError()
+
+            try:
+                response = self.http.post(self.url, json=payload)
+            except httpx.TransportError as e:
+                error_detail = f"{type(e).__name__}: {e}"
+                outcome = 'transport_error'
+                retryable = True
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise LLMError(f"LLM Call failed: malformed response ({e}) | Body: {response.text}", outcome='parse_error')
+                error_detail = f"HTTP {response.status_code} | Body: {response.text}"
+                outcome = 'http_error'
+                retryable = response.status_code in RETRYABLE_STATUS_CODES
+
+            if not retryable:
+                # The upstream answered: a client error says nothing about its health
+                self.breaker.record_success()
+                raise LLMError(f"LLM Call failed: {error_detail}", outcome=outcome)
+
+            self.breaker.record_failure()
+            if attempt == self.max_retries:
+                raise LLMError(f"LLM Call failed after {attempt + 1} attempts: {error_detail}", outcome=outcome)
+
+            delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt))
+            logger.warning("LLM attempt %s failed (%s), retrying in %.2fs", attempt + 1, error_detail, delay)
+            time.sleep(delay)
+
+    def stream_chat(self, messages, call_site='other'):
+        """
+        Yields the content deltas of a streamed (SSE) completion as they arrive.
+        Only the connection is retried: once a token was yielded, errors are raised.
+        """
+        payload = {"messages": messages, "stream": True}
+        if self.model:
+            payload["model"] = self.model
+
+        started = time.monotonic()
+        stats = {'retries': 0}
+        try:
+            for delta in self._stream(payload, stats):
+                if 'first_token' not in stats:
+                    stats['first_token'] = time.monotonic() - started
+                    record_time_to_first_token(call_site, stats['first_token'], model=self.model)
+                yield delta
+        except LLMError as e:
+            record_llm_call(call_site, e.outcome, time.monotonic() - started, model=self.model, retries=stats['retries'])
+            raise
+        # Streamed completions carry no usage block
+        record_llm_call(call_site, 'success', time.monotonic() - started, model=self.model, retries=stats['retries'])
+
+    def _stream(self, payload, stats):
+        streaming = False
+        for attempt in range(self.max_retries + 1):
+            stats['retries'] = attempt
+            if not self.breaker.allow():
+                raise CircuitOpenError()
+
+            try:
+                with self.http.stream("POST", self.url, json=payload) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                        error_detail = f"HTTP {response.status_code} | Body: {response.text}"
+                        outcome = 'http_error'
+                        retryable = response.status_code in RETRYABLE_STATUS_CODES
+                    else:
+                        self.breaker.record_success()
+                        streaming = True
+                        for line in response.iter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                return
+                            try:
+                                delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                            except (ValueError, KeyError, IndexError, TypeError):
+                                continue
+                            if delta:
+                                yield delta
+                        return
+            except httpx.TransportError as e:
+                if streaming:
+                    self.breaker.record_failure()
+                    raise LLMError(f"LLM stream interrupted: {type(e).__name__}: {e}", outcome='transport_error')
+                error_detail = f"{type(e).__name__}: {e}"
+                outcome = 'transport_error'
+                retryable = True
+
+            if not retryable:
+                self.breaker.record_success()
+                raise LLMError(f"LLM Call failed: {error_detail}", outcome=outcome)
+
+            self.breaker.record_failure()
+            if attempt == self.max_retries:
+                raise LLMError(f"LLM Call failed after {attempt + 1} attempts: {error_detail}", outcome=outcome)
+
+            delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt))
+            logger.warning("LLM stream attempt %s failed (%s), retrying in %.2fs", attempt + 1, error_detail, delay)
+            time.sleep(delay)
+
+    def close(self):
+        self.http.close()
+
+
+class HedgedLLMClient:
+    """
+    Spreads calls over several upstream LLMClients (each with its own pool and breaker),
+    healthy ones first in configured order. A call still unanswered after `hedge_delay`
+    seconds, or failed, is also sent to the next upstream and the first answer wins.
+    Past the deadline of its call site the call is abandoned (in-flight requests finish
+    in the background) and LLMDeadlineError is raised so callers use their fallbacks.
+    """
+
+    def __init__(self, upstreams, hedge_delay=2.0, deadlines=None, max_workers=20):
+        self.upstreams = upstreams
+        self.hedge_delay = hedge_delay
+        self.deadlines = deadlines or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+
+    @classmethod
+    def from_settings(cls):
+        base_urls = settings.OPENAI_API_BASE_URLS
+        return cls(
+            upstreams=[LLMClient.from_settings(base_url) for base_url in base_urls],
+            hedge_delay=settings.LLM_HEDGE_DELAY,
+            deadlines={
+                'feedback': settings.LLM_DEADLINE_FEEDBACK,
+                'reinforcement': settings.LLM_DEADLINE_REINFORCEMENT,
+            },
+            max_workers=settings.LLM_MAX_CONNECTIONS * len(base_urls),
+        )
+
+    def _ordered_upstreams(self):
+        return sorted(self.upstreams, key=lambda upstream: upstream.breaker.is_open)
+
+    def chat(self, messages, response_format_json=False, call_site='other', deadline=None):
+        """
+        Same contract as LLMClient.chat. `deadline` (seconds) defaults to the one of `call_site`.
+        """
+        deadline = deadline if deadline is not None else self.deadlines.get(call_site)
+        if len(self.upstreams) == 1 and not deadline:
+            return self.upstreams[0].chat(messages, response_format_json=response_format_json, call_site=call_site)
+
+        started = time.monotonic()
+        candidates = self._ordered_upstreams()
+        pending = set()
+        last_error = None
+
+        def launch():
+            upstream = candidates.pop(0)
+            pending.add(self._pool.submit(
+                upstream.chat, messages, response_format_json=response_format_json, call_site=call_site
+            ))
+
+        launch()
+        while pending:
+            timeout = started + deadline - time.monotonic() if deadline else None
+            if timeout is not None and timeout <= 0:
+                break
+            if candidates:
+                timeout = self.hedge_delay if timeout is None else min(timeout, self.hedge_delay)
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except LLMError as e:
+                    last_error = e
+            if candidates:
+                if not done:
+                    logger.info("LLM call unanswered after %ss, hedging to another upstream", self.hedge_delay)
+                    record_llm_hedge(call_site)
+                launch()
+
+        if pending:
+            record_llm_deadline_exceeded(call_site)
+            raise LLMDeadlineError(f"LLM call exceeded its {deadline}s deadline")
+        raise last_error
+
+    def stream_chat(self, messages, call_site='other'):
+        """
+        Streams from the first healthy upstream, failing over to the next one
+        while no token was yielded. Streams are not hedged.
+        """
+        last_error = None
+        for upstream in self._ordered_upstreams():
+            streamed = False
+            try:
+                for delta in upstream.stream_chat(messages, call_site=call_site):
+                    streamed = True
+                    yield delta
+                return
+            except LLMError as e:
+                if streamed:
+                    raise
+                logger.warning("LLM stream from %s failed before the first token: %s", upstream.url, e)
+                last_error = e
+        raise last_error
+
+    def close(self):
+        for upstream in self.upstreams:
+            upstream.close()
+        self._pool.shutdown(wait=False)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """
+    Returns the process-wide LLM client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HedgedLLMClient.from_settings()
+    return _client
+
+
+def reset_llm_client():
+    """
+    Closes the process-wide client so the next call builds one from the current settings.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
@@ -0,0 +1,180 @@
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+from MeetFlowV1.jobs import run_next_job
+from MeetFlowV1.llm import reset_llm_client
+from MeetFlowV1.mock_llm import start_mock_llm_server
+from MeetFlowV1.models import Module, Unit, MasterExercise, ReinforcementJob
+from MeetFlowV1.services import AI_FLAG_THRESHOLD
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the AI path: drives the third-strike path of ExerciseCheckView for many users, '
+        'then drains the reinforcement jobs, against a bundled mock LLM (or --base-url). '
+        'Runs in a temporary test database (the database user needs CREATE DATABASE): the master module '
+        'and users it creates never reach the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Students getting stuck')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent check requests')
+        parser.add_argument('--workers', type=int, default=2, help='Concurrent reinforcement workers')
+        parser.add_argument('--latency', type=float, default=0.5, help='Mock LLM latency (seconds)')
+        parser.add_argument('--jitter', type=float, default=0.2, help='Mock LLM latency jitter (seconds)')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Mock LLM share of HTTP 503 answers')
+        parser.add_argument('--upstreams', type=int, default=1, help='Mock LLM upstreams to hedge across')
+        parser.add_argument(
+            '--base-url', help='Benchmark external OpenAI-compatible endpoints (comma-separated) instead of the mocks'
+        )
+        parser.add_argument('--shared-errors', action='store_true', help='Every user submits the same wrong answers')
+        parser.add_argument('--host', default='localhost', help='Host header of the simulated requests (must be allowed)')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        # The benchmark curriculum is a master module: in the configured database it would bump the
+        # curriculum version of every process and could be offered to real users as their intro module
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0, keepdb=options['keepdb'])
+
+    def benchmark(self, options):
+        servers = []
+        if options['base_url']:
+            base_urls = [url.strip() for url in options['base_url'].split(',') if url.strip()]
+        else:
+            servers = [
+                start_mock_llm_server(
+                    latency=options['latency'], jitter=options['jitter'], failure_rate=options['failure_rate']
+                )
+                for _ in range(options['upstreams'])
+            ]
+            base_urls = [server.base_url for server in servers]
+        self.stdout.write(f'LLM endpoints: {", ".join(base_urls)}')
+
+        run_id = uuid.uuid4().hex[:8]
+        module = None
+        users = []
+        try:
+            with override_settings(
+                OPENAI_API_BASE_URL=base_urls[0], OPENAI_API_BASE_URLS=base_urls, OPENAI_API_KEY=None, OPENAI_MODEL=None
+            ):
+                reset_llm_client()
+                module, exercise = self.create_curriculum(run_id)
+                users = [
+                    User.objects.create_user(username=f'benchmark_{run_id}_{idx}', password=uuid.uuid4().hex)
+                    for idx in range(options['users'])
+                ]
+
+                strike_latencies, check_latencies, check_wall = self.run_checks(exercise, users, options)
+                job_latencies, occupancy, drain_wall = self.drain_jobs(users, options['workers'])
+
+                self.report('Third-strike check requests', strike_latencies)
+                self.report('All check requests', check_latencies)
+                self.stdout.write(f'  throughput: {len(check_latencies) / check_wall:.1f} req/s')
+                self.report('Reinforcement jobs (queued -> done)', job_latencies)
+                self.stdout.write(f'  drained in {drain_wall:.2f}s with {options["workers"]} workers')
+                for idx, busy in enumerate(occupancy):
+                    self.stdout.write(f'  worker {idx}: {100 * busy / drain_wall:.1f}% occupied')
+                if servers:
+                    self.stdout.write(f'LLM requests: {" + ".join(str(server.requests) for server in servers)}')
+        finally:
+            for user in users:
+                user.delete()
+            if module is not None:
+                module.delete()
+            reset_llm_client()
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+
+    def create_curriculum(self, run_id):
+        module = Module.objects.create(title=f'Benchmark {run_id}', order=0)
+        unit = Unit.objects.create(module=module, title='Benchmark Unit', order=1)
+        exercise = MasterExercise.objects.create(
+            unit=unit, type='THEORY', order=1,
+            content={'question': 'Benchmark question', 'options': {'a': 'Right', 'b': 'Wrong'}},
+            solution={'expected': 'a', 'explanation': 'Benchmark'}
+        )
+        return module, exercise
+
+    def run_checks(self, exercise, users, options):
+        strike_latencies = []
+        check_latencies = []
+        lock = threading.Lock()
+
+        def get_stuck(idx, user):
+            client = APIClient(SERVER_NAME=options['host'])
+            client.force_authenticate(user=user)
+            try:
+                for strike in range(1, AI_FLAG_THRESHOLD + 1):
+                    answer = f'wrong {strike}' if options['shared_errors'] else f'wrong {idx}-{strike}'
+                    started = time.perf_counter()
+                    response = client.post(f'/api/exercises/{exercise.id}/check/', {'answer': answer}, format='json')
+                    elapsed = time.perf_counter() - started
+                    if response.status_code != 200:
+                        raise RuntimeError(f'Check request failed with HTTP {response.status_code}')
+                    with lock:
+                        check_latencies.append(elapsed)
+                        if strike == AI_FLAG_THRESHOLD:
+                            strike_latencies.append(elapsed)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for future in [executor.submit(get_stuck, idx, user) for idx, user in enumerate(users)]:
+                future.result()
+        return strike_latencies, check_latencies, time.perf_counter() - started
+
+    def drain_jobs(self, users, workers):
+        occupancy = [0.0] * workers
+
+        def work(idx):
+            try:
+                while True:
+                    started = time.perf_counter()
+                    if run_next_job() is None:
+                        return
+                    occupancy[idx] += time.perf_counter() - started
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(work, idx) for idx in range(workers)]:
+                future.result()
+        drain_wall = time.perf_counter() - started
+
+        jobs = ReinforcementJob.objects.filter(user__in=users)
+        failed = jobs.exclude(status='DONE').count()
+        if failed:
+            self.stderr.write(self.style.WARNING(f'{failed} jobs did not finish'))
+        job_latencies = [(job.updated_at - job.created_at).total_seconds() for job in jobs.filter(status='DONE')]
+        return job_latencies, occupancy, drain_wall
+
+    def report(self, title, latencies):
+        self.stdout.write(self.style.SUCCESS(f'{title}: {len(latencies)} samples'))
+        self.stdout.write(
+            f'  p50 {1000 * percentile(latencies, 50):.0f} ms | '
+            f'p95 {1000 * percentile(latencies, 95):.0f} ms | '
+            f'p99 {1000 * percentile(latencies, 99):.0f} ms'
+        )
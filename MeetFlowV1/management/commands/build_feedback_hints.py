@@ -0,0 +1,106 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from MeetFlowV1.feedback_hints import HINT_EXERCISE_TYPES, answers_signature, store_feedback_hint
+from MeetFlowV1.models import MasterExercise, UserExerciseAttempt, FeedbackHintEntry
+from MeetFlowV1.services import AIService, FEEDBACK_FALLBACK
+
+
+def wrong_answers(exercise):
+    """
+    Every wrong answer of a closed exercise (Parsons orderings are too many to enumerate).
+    """
+    content = exercise.content or {}
+    solution = exercise.solution or {}
+    if exercise.type in ('THEORY', 'BLANKS'):
+        options = content.get('options') or []
+        answers = list(options.keys()) if isinstance(options, dict) else list(options)
+        expected = str(solution.get('expected', '')).strip().lower()
+    elif exercise.type == 'DEBUG':
+        answers = [line.get('id') for line in content.get('lines', []) if isinstance(line, dict)]
+        expected = str(solution.get('error_line_id', '')).strip().lower()
+    else:
+        return []
+    return [answer for answer in answers if answer and str(answer).strip().lower() != expected]
+
+
+class Command(BaseCommand):
+    help = (
+        'Pre-generates feedback hints for closed master exercises (BLANKS, PARSONS, DEBUG, THEORY): '
+        'one per possible wrong answer repeated, plus the most frequent wrong-answer histories '
+        'of students already flagged for AI support. Uses the configured LLM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Maximum number of LLM calls in flight')
+        parser.add_argument('--refresh', action='store_true', help='Regenerate hints that are already stored')
+        parser.add_argument('--observed', type=int, default=5, help='Most frequent observed histories per exercise')
+        parser.add_argument('--module', type=int, action='append', dest='module_ids', help='Only this master module id (repeatable)')
+
+    def handle(self, *args, **options):
+        exercises = MasterExercise.objects.filter(
+            type__in=HINT_EXERCISE_TYPES, unit__module__user=None, unit__module__is_ai_generated=False
+        )
+        if options['module_ids']:
+            exercises = exercises.filter(unit__module_id__in=options['module_ids'])
+        exercises = exercises.in_bulk()
+
+        # (exercise id, signature) -> a wrong-answer history with that signature
+        histories = {}
+        for exercise in exercises.values():
+            for answer in wrong_answers(exercise):
+                histories[(exercise.id, answers_signature([answer]))] = [answer]
+
+        observed = Counter()
+        samples = {}
+        flagged = UserExerciseAttempt.objects.filter(
+            master_exercise_id__in=exercises.keys(), is_flagged_for_ai=True
+        ).values_list('master_exercise_id', 'error_log')
+        for exercise_id, error_log in flagged.iterator():
+            key = (exercise_id, answers_signature(error_log))
+            observed[key] += 1
+            samples.setdefault(key, error_log)
+        taken = Counter()
+        for key, _ in observed.most_common():
+            if taken[key[0]] < options['observed']:
+                taken[key[0]] += 1
+                histories.setdefault(key, samples[key])
+
+        if not options['refresh']:
+            fresh_after = timezone.now() - timedelta(days=settings.FEEDBACK_HINT_TTL_DAYS)
+            stored = FeedbackHintEntry.objects.filter(
+                exercise_id__in=exercises.keys(), created_at__gte=fresh_after
+            ).values_list('exercise_id', 'answers_signature')
+            for key in stored:
+                histories.pop(key, None)
+
+        if not histories:
+            self.stdout.write(self.style.SUCCESS('Feedback hints are up to date'))
+            return
+
+        self.stdout.write(f'Generating {len(histories)} feedback hints with concurrency {options["concurrency"]}...')
+        generated = failed = 0
+        # Worker threads only talk to the LLM; every database write happens in this thread
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as executor:
+            futures = {
+                executor.submit(
+                    AIService.get_adaptive_feedback, exercises[exercise_id], error_log, use_hint_store=False
+                ): (exercise_id, error_log)
+                for (exercise_id, _), error_log in histories.items()
+            }
+            for future in as_completed(futures):
+                exercise_id, error_log = futures[future]
+                hint = future.result()
+                if hint == FEEDBACK_FALLBACK:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'{exercises[exercise_id]} {error_log}: generation failed'))
+                    continue
+
+                store_feedback_hint(exercises[exercise_id], error_log, hint)
+                generated += 1
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f'Feedback hints: {generated} generated, {failed} failed'))
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from MeetFlowV1.models import Module, MasterExercise, ReinforcementBankEntry
+from MeetFlowV1.reinforcement_cache import store_bank_reinforcement
+from MeetFlowV1.services import AIService
+
+
+class Command(BaseCommand):
+    help = (
+        'Pre-generates reinforcement exercise sets for every master module and exercise type. '
+        'Uses the LLM configured in OPENAI_API_BASE_URL (point it to a local stand-in if needed).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Maximum number of LLM calls in flight')
+        parser.add_argument('--refresh', action='store_true', help='Regenerate entries that already exist in the bank')
+        parser.add_argument('--module', type=int, action='append', dest='module_ids', help='Only this master module id (repeatable)')
+
+    def handle(self, *args, **options):
+        pairs = (
+            MasterExercise.objects
+            .filter(unit__module__user=None, unit__module__is_ai_generated=False)
+            .values_list('unit__module_id', 'type')
+            .distinct()
+            .order_by('unit__module_id', 'type')
+        )
+        if options['module_ids']:
+            pairs = pairs.filter(unit__module_id__in=options['module_ids'])
+        pairs = set(pairs)
+
+        if not options['refresh']:
+            pairs -= set(ReinforcementBankEntry.objects.values_list('source_module_id', 'exercise_type'))
+
+        if not pairs:
+            self.stdout.write(self.style.SUCCESS('Reinforcement bank is up to date'))
+            return
+
+        modules = Module.objects.in_bulk({module_id for module_id, _ in pairs})
+        self.stdout.write(f'Generating {len(pairs)} reinforcement sets with concurrency {options["concurrency"]}...')
+
+        generated = failed = 0
+        # Worker threads only talk to the LLM; every database write happens in this thread
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as executor:
+            futures = {
+                executor.submit(AIService._generate_reinforcement_content, modules[module_id], exercise_type, []): (module_id, exercise_type)
+                for module_id, exercise_type in sorted(pairs)
+            }
+            for future in as_completed(futures):
+                module_id, exercise_type = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'{modules[module_id].title} ({exercise_type}): {str(e)}'))
+                    continue
+
+                store_bank_reinforcement(module_id, exercise_type, data)
+                generated += 1
+                self.stdout.write(f'{modules[module_id].title} ({exercise_type}): {len(data["exercises"])} exercises')
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f'Reinforcement bank: {generated} generated, {failed} failed'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from MeetFlowV1.mock_llm import MockLLMServer
+
+
+class Command(BaseCommand):
+    help = 'Runs a local OpenAI-compatible chat completions stand-in (set OPENAI_API_BASE_URL to its URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latency', type=float, default=0.5, help='Seconds before each response')
+        parser.add_argument('--jitter', type=float, default=0.2, help='Random +/- seconds added to the latency')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered with HTTP 503 (0-1)')
+        parser.add_argument('--stream-delay', type=float, default=0.02, help='Seconds between streamed chunks')
+        parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    def handle(self, *args, **options):
+        server = MockLLMServer(
+            (options['host'], options['port']),
+            latency=options['latency'],
+            jitter=options['jitter'],
+            failure_rate=options['failure_rate'],
+            stream_delay=options['stream_delay'],
+            verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Mock LLM listening on {server.base_url}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Served {server.requests} requests')
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from MeetFlowV1.jobs import run_next_job
+
+
+class Command(BaseCommand):
+    help = 'Processes queued AI reinforcement jobs (adaptive feedback and reinforcement modules)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Process the pending jobs and exit')
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+        self.stdout.write(self.style.SUCCESS('Reinforcement worker started'))
+
+        while True:
+            job = run_next_job()
+            if job is not None:
+                style = self.style.SUCCESS if job.status == 'DONE' else self.style.ERROR
+                self.stdout.write(style(f'Job {job.id}: {job.status}'))
+                continue
+
+            if options['once']:
+                break
+            time.sleep(poll_interval)
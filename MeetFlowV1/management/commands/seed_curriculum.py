@@ -2,7 +2,10 @@ import json
 import os
 from django.core.management.base import BaseCommand
 from django.db import transaction, connection
-from MeetFlowV1.models import Module, Unit, MasterExercise, ModuleDependency, UserModuleProgress, UserExerciseAttempt
+from MeetFlowV1.models import (
+    Module, Unit, MasterExercise, ModuleDependency, UserModuleProgress, UserExerciseAttempt, UserProgressBitmap
+)
+from MeetFlowV1.versioning import bump_curriculum_version
 
 class Command(BaseCommand):
     help = 'Loads the curriculum from a JSON file, deleting previous data'
@@ -24,6 +27,8 @@ class Command(BaseCommand):
             with transaction.atomic():
                 self.clear_existing_data()
                 self.seed_data(data)
+                # Every cached map was built from the previous curriculum
+                bump_curriculum_version()
                 self.stdout.write(self.style.SUCCESS('Curriculum loaded successfully after clearing previous data'))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error loading curriculum: {str(e)}'))
@@ -38,6 +43,7 @@ class Command(BaseCommand):
             ModuleDependency,
             UserExerciseAttempt,
             UserModuleProgress,
+            UserProgressBitmap,
             MasterExercise,
             Unit,
             Module
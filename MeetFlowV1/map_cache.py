@@ -0,0 +1,37 @@
+from django.core.cache import cache
+
+SNAPSHOT_KEY = 'meetflow:map_snapshot:{user_id}:{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+
+def get_map_snapshot(user_id, version):
+    """
+    Returns the materialized nodes/edges payload of a user's map for the given version, or None.
+    """
+    return cache.get(SNAPSHOT_KEY.format(user_id=user_id, version=version))
+
+
+def store_map_snapshot(user_id, version, payload):
+    cache.set(SNAPSHOT_KEY.format(user_id=user_id, version=version), payload, SNAPSHOT_TIMEOUT)
+
+
+def diff_map_payload(previous, current):
+    """
+    Computes the delta between two map payloads: nodes/edges that are new or changed
+    (status, completion, position...) and the ids of the ones that disappeared.
+    """
+    def _diff(old_items, new_items):
+        old_by_id = {item['id']: item for item in old_items}
+        new_by_id = {item['id']: item for item in new_items}
+        changed = [item for item_id, item in new_by_id.items() if old_by_id.get(item_id) != item]
+        removed = [item_id for item_id in old_by_id if item_id not in new_by_id]
+        return changed, removed
+
+    nodes, removed_nodes = _diff(previous['nodes'], current['nodes'])
+    edges, removed_edges = _diff(previous['edges'], current['edges'])
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'removed_nodes': removed_nodes,
+        'removed_edges': removed_edges,
+    }
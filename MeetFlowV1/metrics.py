@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# Counters live in the Django cache so the web processes and the reinforcement worker
+# report into the same series when a shared backend (Redis, Memcached) is configured.
+METRIC_KEY = 'meetflow:metrics:{name}:{labels}'
+# Models that reported LLM calls, so their series can be enumerated when rendering
+MODELS_KEY = 'meetflow:metrics:models'
+
+CALL_SITES = ('feedback', 'feedback_stream', 'reinforcement', 'other')
+LLM_OUTCOMES = ('success', 'http_error', 'transport_error', 'circuit_open', 'parse_error')
+REINFORCEMENT_OUTCOMES = (
+    'cache_hit', 'bank_hit', 'generated', 'parse_error', 'llm_error', 'limit_reached', 'duplicate', 'skipped'
+)
+FEEDBACK_OUTCOMES = ('hint_hit', 'generated', 'fallback')
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Sums are kept as integers (cache.incr): durations in microseconds
+MICROSECONDS = 1_000_000
+
+
+def _key(name, **labels):
+    return METRIC_KEY.format(name=name, labels=','.join(f'{label}={value}' for label, value in sorted(labels.items())))
+
+
+def _incr(key, amount=1):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def _observe(name, seconds, **labels):
+    for bucket in LATENCY_BUCKETS:
+        if seconds <= bucket:
+            _incr(_key(f'{name}_bucket', le=bucket, **labels))
+    _incr(_key(f'{name}_count', **labels))
+    _incr(_key(f'{name}_sum', **labels), int(seconds * MICROSECONDS))
+
+
+def _model_label(model):
+    model = model or 'default'
+    models = cache.get(MODELS_KEY) or []
+    if model not in models:
+        cache.set(MODELS_KEY, models + [model], timeout=None)
+    return model
+
+
+def record_llm_call(call_site, outcome, duration, model=None, prompt_tokens=0, completion_tokens=0, retries=0):
+    """
+    Records one LLM call (retries included) made from `call_site` to `model`.
+    """
+    call_site = call_site if call_site in CALL_SITES else 'other'
+    model = _model_label(model)
+    _observe('llm_request_duration_seconds', duration, call_site=call_site, model=model, outcome=outcome)
+    if prompt_tokens:
+        _incr(_key('llm_prompt_tokens_total', call_site=call_site, model=model), prompt_tokens)
+    if completion_tokens:
+        _incr(_key('llm_completion_tokens_total', call_site=call_site, model=model), completion_tokens)
+    if retries:
+        _incr(_key('llm_retries_total', call_site=call_site, model=model), retries)
+
+
+def record_time_to_first_token(call_site, seconds, model=None):
+    call_site = call_site if call_site in CALL_SITES else 'other'
+    _observe('llm_time_to_first_token_seconds', seconds, call_site=call_site, model=_model_label(model))
+
+
+def record_llm_hedge(call_site):
+    call_site = call_site if call_site in CALL_SITES else 'other'
+    _incr(_key('llm_hedged_requests_total', call_site=call_site))
+
+
+def record_llm_deadline_exceeded(call_site):
+    call_site = call_site if call_site in CALL_SITES else 'other'
+    _incr(_key('llm_deadline_exceeded_total', call_site=call_site))
+
+
+def record_reinforcement_outcome(outcome):
+    _incr(_key('reinforcement_outcomes_total', outcome=outcome))
+
+
+def record_feedback_outcome(outcome):
+    _incr(_key('feedback_outcomes_total', outcome=outcome))
+
+
+def _histogram_series(name, label_sets):
+    series = []
+    for labels in label_sets:
+        for bucket in LATENCY_BUCKETS:
+            series.append((f'{name}_bucket', {**labels, 'le': bucket}))
+        series.append((f'{name}_count', labels))
+        series.append((f'{name}_sum', labels))
+    return series
+
+
+def _all_series():
+    models = sorted(set(cache.get(MODELS_KEY) or []) | {settings.OPENAI_MODEL or 'default'})
+    durations = [
+        {'call_site': site, 'model': model, 'outcome': outcome}
+        for site in CALL_SITES for model in models for outcome in LLM_OUTCOMES
+    ]
+    per_model = [{'call_site': site, 'model': model} for site in CALL_SITES for model in models]
+    per_site = [{'call_site': site} for site in CALL_SITES]
+    series = _histogram_series('llm_request_duration_seconds', durations)
+    series += _histogram_series('llm_time_to_first_token_seconds', per_model)
+    for name in ('llm_prompt_tokens_total', 'llm_completion_tokens_total', 'llm_retries_total'):
+        series += [(name, labels) for labels in per_model]
+    for name in ('llm_hedged_requests_total', 'llm_deadline_exceeded_total'):
+        series += [(name, labels) for labels in per_site]
+    series += [('reinforcement_outcomes_total', {'outcome': outcome}) for outcome in REINFORCEMENT_OUTCOMES]
+    series += [('feedback_outcomes_total', {'outcome': outcome}) for outcome in FEEDBACK_OUTCOMES]
+    return series
+
+
+def _format_labels(labels):
+    return ','.join(f'{label}="{value}"' for label, value in labels.items())
+
+
+def render_metrics():
+    """
+    Renders every series in the Prometheus text exposition format.
+    Buckets are stored cumulatively; the +Inf bucket is the count.
+    """
+    series = _all_series()
+    values = cache.get_many([_key(name, **labels) for name, labels in series])
+    model = settings.OPENAI_MODEL or 'default'
+
+    lines = [
+        '# HELP llm_info Configured LLM model.',
+        '# TYPE llm_info gauge',
+        f'llm_info{{model="{model}"}} 1',
+    ]
+    typed = set()
+    for name, labels in series:
+        base_name = name.rsplit('_', 1)[0] if name.endswith(('_bucket', '_count', '_sum')) else name
+        if base_name not in typed:
+            typed.add(base_name)
+            lines.append(f'# TYPE {base_name} {"counter" if base_name.endswith("_total") else "histogram"}')
+
+        value = values.get(_key(name, **labels), 0)
+        if name.endswith('_sum'):
+            value = value / MICROSECONDS
+        lines.append(f'{name}{{{_format_labels(labels)}}} {value}')
+        if name.endswith('_count'):
+            inf_labels = {**labels, 'le': '+Inf'}
+            lines.insert(len(lines) - 1, f'{base_name}_bucket{{{_format_labels(inf_labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0006_alter_userexerciseattempt_ai_exercise_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moduledependency',
+            index=models.Index(fields=['target_node', 'user', 'source_node'], name='dependency_incoming_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermoduleprogress',
+            index=models.Index(fields=['user', 'module', 'status'], name='progress_user_status_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0007_dependency_incoming_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProgressBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('curriculum', models.CharField(help_text='CurriculumGraph fingerprint', max_length=40)),
+                ('progress_version', models.BigIntegerField()),
+                ('statuses', models.BinaryField()),
+                ('overlay', models.JSONField(default=dict, help_text='Statuses of modules outside the master graph')),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_bitmaps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'curriculum')},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+TYPE_INDEX = {'BLANKS': 1, 'PARSONS': 2, 'DEBUG': 3, 'CODE': 4}
+OFFSET_Y = {'BLANKS': -60, 'PARSONS': -20, 'DEBUG': 20, 'CODE': 60}
+
+
+def precompute_map_layout(apps, schema_editor):
+    """
+    Stores the display ID, final position, edge labels and bypassed master edges
+    of existing AI modules (previously recomputed on every map request).
+    """
+    Module = apps.get_model('MeetFlowV1', 'Module')
+    ModuleDependency = apps.get_model('MeetFlowV1', 'ModuleDependency')
+
+    ai_modules = Module.objects.filter(is_ai_generated=True, source_module__isnull=False).select_related('source_module')
+    for ai_module in ai_modules.iterator(chunk_size=500):
+        source = ai_module.source_module
+        ai_module.display_id = f"{source.id}.{TYPE_INDEX.get(ai_module.reinforcement_type, 0)}"
+
+        next_dep = ModuleDependency.objects.filter(
+            source_node=source, user=None
+        ).select_related('target_node').order_by('id').first()
+        if next_dep:
+            target = next_dep.target_node
+            ai_module.position_x = (source.position_x + target.position_x) / 2
+            ai_module.position_y = (source.position_y + target.position_y) / 2 + OFFSET_Y.get(ai_module.reinforcement_type, 0)
+        else:
+            ai_module.position_x = source.position_x + 100
+            ai_module.position_y = source.position_y + 50
+        ai_module.save(update_fields=['display_id', 'position_x', 'position_y'])
+
+    ai_dependencies = ModuleDependency.objects.filter(user__isnull=False).select_related('source_node', 'target_node')
+    for dep in ai_dependencies.iterator(chunk_size=500):
+        target = dep.target_node
+        dep.label = f"Reinforcement: {target.reinforcement_type}" if target.is_ai_generated else "AI Reinforcement"
+        if dep.source_node.is_ai_generated and not target.is_ai_generated:
+            dep.bypassed_source_id = dep.source_node.source_module_id
+        dep.save(update_fields=['label', 'bypassed_source'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0008_userprogressbitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='module',
+            name='display_id',
+            field=models.CharField(blank=True, help_text="Map label of AI modules (e.g. '2.1')", max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='moduledependency',
+            name='bypassed_source',
+            field=models.ForeignKey(blank=True, help_text='Source of the master edge (bypassed_source -> target_node) this AI edge replaces on the map', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bypassing_dependencies', to='MeetFlowV1.module'),
+        ),
+        migrations.AddField(
+            model_name='moduledependency',
+            name='label',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(precompute_map_layout, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:25
+
+from django.db import migrations, models
+
+
+def backfill_completion_counters(apps, schema_editor):
+    UserModuleProgress = apps.get_model('MeetFlowV1', 'UserModuleProgress')
+    Unit = apps.get_model('MeetFlowV1', 'Unit')
+    MasterExercise = apps.get_model('MeetFlowV1', 'MasterExercise')
+    AIExercise = apps.get_model('MeetFlowV1', 'AIExercise')
+    UserExerciseAttempt = apps.get_model('MeetFlowV1', 'UserExerciseAttempt')
+
+    progress_rows = UserModuleProgress.objects.select_related('module')
+    for progress in progress_rows.iterator(chunk_size=500):
+        unit = Unit.objects.filter(module_id=progress.module_id).first()
+        if unit is None:
+            continue
+        attempts = UserExerciseAttempt.objects.filter(user_id=progress.user_id, is_completed=True)
+        if progress.module.is_ai_generated:
+            progress.total_count = AIExercise.objects.filter(source_unit=unit, user_id=progress.user_id).count()
+            progress.completed_count = attempts.filter(ai_exercise__source_unit=unit).count()
+        else:
+            progress.total_count = MasterExercise.objects.filter(unit=unit).count()
+            progress.completed_count = attempts.filter(master_exercise__unit=unit).count()
+        progress.save(update_fields=['total_count', 'completed_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0009_precomputed_map_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermoduleprogress',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usermoduleprogress',
+            name='total_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_completion_counters, migrations.RunPython.noop),
+    ]
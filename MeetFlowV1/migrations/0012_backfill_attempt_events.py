@@ -0,0 +1,65 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+ERROR_LOG_LIMIT = 5
+
+
+def backfill_attempt_events(apps, schema_editor):
+    """
+    Moves existing error_log entries to AttemptEvent and caps every error_log
+    to its latest entries. Runs in chunks, each one in its own transaction,
+    so large tables are not locked for the whole migration.
+    """
+    UserExerciseAttempt = apps.get_model('MeetFlowV1', 'UserExerciseAttempt')
+    AttemptEvent = apps.get_model('MeetFlowV1', 'AttemptEvent')
+
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                UserExerciseAttempt.objects.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+
+            events = []
+            trimmed = []
+            for attempt in batch:
+                error_log = attempt.error_log or []
+                # A single legacy entry (e.g. a Pyodide error string) instead of a list of them
+                single_entry = not isinstance(error_log, list)
+                if single_entry:
+                    error_log = [error_log]
+                # Entry timestamps were never stored: the last attempt date is the best approximation
+                events.extend(
+                    AttemptEvent(
+                        attempt_id=attempt.pk,
+                        user_id=attempt.user_id,
+                        master_exercise_id=attempt.master_exercise_id,
+                        ai_exercise_id=attempt.ai_exercise_id,
+                        answer=entry,
+                        is_correct=False,
+                        created_at=attempt.last_attempt_at,
+                    )
+                    for entry in error_log
+                )
+                if single_entry or len(error_log) > ERROR_LOG_LIMIT:
+                    attempt.error_log = error_log[-ERROR_LOG_LIMIT:]
+                    trimmed.append(attempt)
+
+            AttemptEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+            UserExerciseAttempt.objects.bulk_update(trimmed, ['error_log'], batch_size=BATCH_SIZE)
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits on its own
+    atomic = False
+
+    dependencies = [
+        ('MeetFlowV1', '0011_attemptevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_attempt_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0012_backfill_attempt_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReinforcementJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exercise_type', models.CharField(max_length=20)),
+                ('error_log', models.JSONField(default=list)),
+                ('inject_module', models.BooleanField(default=True, help_text='False in review mode and for AI exercises (feedback only)')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('feedback', models.TextField(blank=True, default='')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ai_exercise', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_jobs', to='MeetFlowV1.aiexercise')),
+                ('master_exercise', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_jobs', to='MeetFlowV1.masterexercise')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_jobs', to='MeetFlowV1.module')),
+                ('result_module', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='MeetFlowV1.module')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reinforcementjob',
+            index=models.Index(fields=['status', 'created_at'], name='reinforcement_job_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0013_reinforcementjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReinforcementCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exercise_type', models.CharField(max_length=20)),
+                ('error_signature', models.CharField(max_length=40)),
+                ('curriculum', models.CharField(help_text='CurriculumGraph.fingerprint', max_length=40)),
+                ('module_title', models.CharField(max_length=200)),
+                ('exercises', models.JSONField(default=list)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source_module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_cache_entries', to='MeetFlowV1.module')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reinforcementcacheentry',
+            index=models.Index(fields=['last_used_at'], name='reinforcement_cache_lru_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reinforcementcacheentry',
+            unique_together={('source_module', 'exercise_type', 'error_signature', 'curriculum')},
+        ),
+    ]
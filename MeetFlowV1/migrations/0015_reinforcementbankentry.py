@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0014_reinforcementcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReinforcementBankEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exercise_type', models.CharField(max_length=20)),
+                ('module_title', models.CharField(max_length=200)),
+                ('exercises', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source_module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_bank_entries', to='MeetFlowV1.module')),
+            ],
+            options={
+                'unique_together': {('source_module', 'exercise_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0015_reinforcementbankentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reinforcementjob',
+            name='include_feedback',
+            field=models.BooleanField(default=True, help_text='False when the client streams the feedback itself'),
+        ),
+    ]
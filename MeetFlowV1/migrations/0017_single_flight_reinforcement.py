@@ -0,0 +1,137 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:38
+
+import logging
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+logger = logging.getLogger(__name__)
+
+# When both duplicates have progress for the user, the furthest status is kept
+STATUS_RANK = {'LOCKED': 0, 'AVAILABLE': 1, 'STUCK': 2, 'COMPLETED': 3}
+
+
+def merge_module(apps, keep_id, duplicate_id):
+    """
+    Moves everything that references a duplicate AI module onto the kept one: exercises
+    (with their attempts and history), progress, dependencies and jobs. Only the emptied
+    duplicate module and unit are deleted, together with their regenerable cache entries.
+    """
+    Module = apps.get_model('MeetFlowV1', 'Module')
+    Unit = apps.get_model('MeetFlowV1', 'Unit')
+    AIExercise = apps.get_model('MeetFlowV1', 'AIExercise')
+    UserModuleProgress = apps.get_model('MeetFlowV1', 'UserModuleProgress')
+    UserProgressBitmap = apps.get_model('MeetFlowV1', 'UserProgressBitmap')
+    ModuleDependency = apps.get_model('MeetFlowV1', 'ModuleDependency')
+    ReinforcementJob = apps.get_model('MeetFlowV1', 'ReinforcementJob')
+
+    keep_unit = Unit.objects.filter(module_id=keep_id).first()
+    duplicate_unit = Unit.objects.filter(module_id=duplicate_id).first()
+    if duplicate_unit is not None:
+        if keep_unit is None:
+            Unit.objects.filter(id=duplicate_unit.id).update(module_id=keep_id)
+        else:
+            AIExercise.objects.filter(source_unit_id=duplicate_unit.id).update(source_unit_id=keep_unit.id)
+
+    for progress in UserModuleProgress.objects.filter(module_id=duplicate_id):
+        kept = UserModuleProgress.objects.filter(user_id=progress.user_id, module_id=keep_id).first()
+        if kept is None:
+            kept, progress.module_id = progress, keep_id
+        else:
+            if STATUS_RANK.get(progress.status, 0) > STATUS_RANK.get(kept.status, 0):
+                kept.status = progress.status
+            progress.delete()
+        # The unit gained exercises: counters are recounted on the next completion
+        kept.completed_count = kept.total_count = 0
+        kept.save()
+        # Bitmap overlays are keyed by module id; they are rebuilt from the rows
+        UserProgressBitmap.objects.filter(user_id=kept.user_id).delete()
+
+    for field in ('source_node_id', 'target_node_id', 'bypassed_source_id'):
+        for edge in ModuleDependency.objects.filter(**{field: duplicate_id}):
+            setattr(edge, field, keep_id)
+            already_linked = ModuleDependency.objects.filter(
+                source_node_id=edge.source_node_id, target_node_id=edge.target_node_id, user_id=edge.user_id
+            ).exclude(id=edge.id).exists()
+            if already_linked or edge.source_node_id == edge.target_node_id:
+                edge.delete()
+            else:
+                edge.save()
+
+    ReinforcementJob.objects.filter(module_id=duplicate_id).update(module_id=keep_id)
+    ReinforcementJob.objects.filter(result_module_id=duplicate_id).update(result_module_id=keep_id)
+    Module.objects.filter(source_module_id=duplicate_id).update(source_module_id=keep_id)
+
+    logger.warning('Merged duplicate AI reinforcement module %s into %s', duplicate_id, keep_id)
+    Module.objects.filter(id=duplicate_id).delete()
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Clears the duplicates that concurrent injections could create before the
+    constraints existed: the AI modules of each (user, source module, type) are
+    merged into the oldest one, and only the oldest active job of each
+    (user, module, type) stays active.
+    """
+    Module = apps.get_model('MeetFlowV1', 'Module')
+    ReinforcementJob = apps.get_model('MeetFlowV1', 'ReinforcementJob')
+
+    # Re-pointing the AI children of a duplicate can reveal new duplicates among them
+    while True:
+        duplicated_modules = list(
+            Module.objects.filter(is_ai_generated=True)
+            .values('user_id', 'source_module_id', 'reinforcement_type')
+            .annotate(total=Count('id'), keep_id=Min('id'))
+            .filter(total__gt=1)
+            .order_by()
+        )
+        if not duplicated_modules:
+            break
+        for group in duplicated_modules:
+            duplicate_ids = Module.objects.filter(
+                is_ai_generated=True,
+                user_id=group['user_id'],
+                source_module_id=group['source_module_id'],
+                reinforcement_type=group['reinforcement_type']
+            ).exclude(id=group['keep_id']).values_list('id', flat=True)
+            for duplicate_id in list(duplicate_ids):
+                merge_module(apps, group['keep_id'], duplicate_id)
+
+    duplicated_jobs = (
+        ReinforcementJob.objects.filter(status__in=['PENDING', 'RUNNING'])
+        .values('user_id', 'module_id', 'exercise_type')
+        .annotate(total=Count('id'), keep_id=Min('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in duplicated_jobs:
+        superseded = ReinforcementJob.objects.filter(
+            status__in=['PENDING', 'RUNNING'],
+            user_id=group['user_id'],
+            module_id=group['module_id'],
+            exercise_type=group['exercise_type']
+        ).exclude(id=group['keep_id'])
+        logger.warning('Failing reinforcement jobs %s superseded by job %s', list(superseded.values_list('id', flat=True)), group['keep_id'])
+        superseded.update(status='FAILED', error='Superseded by an identical active job')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0016_reinforcementjob_include_feedback'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Merging loses no rows, so unapplying only has to drop the constraints
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='module',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_ai_generated', True)), fields=('user', 'source_module', 'reinforcement_type'), name='unique_ai_reinforcement_module'),
+        ),
+        migrations.AddConstraint(
+            model_name='reinforcementjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('user', 'module', 'exercise_type'), name='unique_active_reinforcement_job'),
+        ),
+    ]
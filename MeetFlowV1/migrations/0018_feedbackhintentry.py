@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0017_single_flight_reinforcement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackHintEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answers_signature', models.CharField(max_length=40)),
+                ('hint', models.TextField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedback_hints', to='MeetFlowV1.masterexercise')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedbackhintentry',
+            index=models.Index(fields=['last_used_at'], name='feedback_hint_lru_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feedbackhintentry',
+            unique_together={('exercise', 'answers_signature')},
+        ),
+    ]
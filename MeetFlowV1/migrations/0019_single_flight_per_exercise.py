@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0018_feedbackhintentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='reinforcementjob',
+            name='unique_active_reinforcement_job',
+        ),
+        migrations.AddConstraint(
+            model_name='reinforcementjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('master_exercise__isnull', False), ('status__in', ['PENDING', 'RUNNING'])), fields=('user', 'master_exercise'), name='unique_active_reinforcement_job'),
+        ),
+        migrations.AddConstraint(
+            model_name='reinforcementjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('ai_exercise__isnull', False), ('status__in', ['PENDING', 'RUNNING'])), fields=('user', 'ai_exercise'), name='unique_active_ai_reinforcement_job'),
+        ),
+    ]
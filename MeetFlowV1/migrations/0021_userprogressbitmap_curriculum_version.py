@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MeetFlowV1', '0020_versioncounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogressbitmap',
+            name='curriculum_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
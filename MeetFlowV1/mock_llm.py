@@ -0,0 +1,141 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_FEEDBACK = (
+    "You are close: re-read how the statement works step by step. "
+    "Check the order of the operations before running it again."
+)
+
+
+def mock_reinforcement(title="Mock Module"):
+    """
+    Canned reinforcement module in the schema requested by AIService._generate_reinforcement_content.
+    """
+    return {
+        "module_title": f"Theoretical Reinforcement: {title}",
+        "exercises": [
+            {
+                "type": "THEORY",
+                "content": {
+                    "instruction": "Select the correct option based on the theoretical concept.",
+                    "question": f"Mock question {idx + 1}?",
+                    "options": {"a": "Option A", "b": "Option B", "c": "Option C", "d": "Option D"}
+                },
+                "solution": {"expected": "a", "explanation": "Option A is the mock answer."}
+            }
+            for idx in range(3)
+        ]
+    }
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI-compatible POST .../chat/completions stand-in. Behaviour comes from the server:
+    latency, jitter, failure_rate and stream_delay (seconds between streamed chunks).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found"}})
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON"}})
+
+        self.server.record_request()
+        delay = max(0.0, self.server.latency + random.uniform(-self.server.jitter, self.server.jitter))
+        time.sleep(delay)
+
+        if random.random() < self.server.failure_rate:
+            return self._send_json(503, {"error": {"message": "Mock upstream failure"}})
+
+        prompt = " ".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        content = json.dumps(mock_reinforcement()) if "module_title" in prompt else MOCK_FEEDBACK
+
+        if payload.get("stream"):
+            return self._send_stream(content)
+
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "model": payload.get("model") or "mock",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(prompt.split()) + len(content.split())
+            }
+        })
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = content.split(" ")
+        for idx, word in enumerate(words):
+            delta = word if idx == len(words) - 1 else f"{word} "
+            chunk = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.server.stream_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.0, failure_rate=0.0, stream_delay=0.02, verbose=False):
+        super().__init__(address, MockLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stream_delay = stream_delay
+        self.verbose = verbose
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def handle_error(self, request, client_address):
+        # Clients abandon the losing request of a hedged call
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+
+def start_mock_llm_server(host="127.0.0.1", port=0, **options):
+    """
+    Starts a MockLLMServer in a background thread (port 0 picks a free port). Call shutdown() to stop it.
+    """
+    server = MockLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Module(models.Model):
@@ -11,9 +12,18 @@ class Module(models.Model):
     order = models.PositiveIntegerField(default=0)
     position_x = models.FloatField(default=0.0)
     position_y = models.FloatField(default=0.0)
+    display_id = models.CharField(max_length=20, null=True, blank=True, help_text="Map label of AI modules (e.g. '2.1')")
 
     class Meta:
         ordering = ['order']
+        constraints = [
+            # One AI reinforcement per user, source module and type, even under concurrent injections
+            models.UniqueConstraint(
+                fields=['user', 'source_module', 'reinforcement_type'],
+                condition=models.Q(is_ai_generated=True),
+                name='unique_ai_reinforcement_module'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -67,9 +77,19 @@ class ModuleDependency(models.Model):
     source_node = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='outgoing_dependencies')
     target_node = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='incoming_dependencies')
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='custom_dependencies')
+    # Precomputed at injection time for AI edges
+    label = models.CharField(max_length=255, null=True, blank=True)
+    bypassed_source = models.ForeignKey(
+        Module, on_delete=models.CASCADE, null=True, blank=True, related_name='bypassing_dependencies',
+        help_text="Source of the master edge (bypassed_source -> target_node) this AI edge replaces on the map"
+    )
 
     class Meta:
         unique_together = ('source_node', 'target_node', 'user')
+        indexes = [
+            # Incoming edges of a module (master + per-user overlay) for the unlock anti-join
+            models.Index(fields=['target_node', 'user', 'source_node'], name='dependency_incoming_idx'),
+        ]
 
     def __str__(self):
         return f"{self.source_node} -> {self.target_node} (User: {self.user})"
@@ -91,6 +111,28 @@ class UserExerciseAttempt(models.Model):
             ['user', 'ai_exercise']
         ]
 
+class AttemptEvent(models.Model):
+    """
+    Append-only history of the answers submitted for an exercise.
+    UserExerciseAttempt.error_log only keeps the latest entries (ring buffer).
+    """
+    attempt = models.ForeignKey(UserExerciseAttempt, on_delete=models.CASCADE, related_name='events')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempt_events')
+    master_exercise = models.ForeignKey(MasterExercise, on_delete=models.CASCADE, null=True, blank=True, related_name='attempt_events')
+    ai_exercise = models.ForeignKey(AIExercise, on_delete=models.CASCADE, null=True, blank=True, related_name='attempt_events')
+    answer = models.JSONField(null=True, blank=True)
+    is_correct = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # "Last N events of an attempt"
+            models.Index(fields=['attempt', '-created_at'], name='attempt_event_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - attempt {self.attempt_id}: {'correct' if self.is_correct else 'wrong'}"
+
 class UserModuleProgress(models.Model):
     STATUS_CHOICES = [
         ('LOCKED', 'Locked'),
@@ -101,10 +143,199 @@ class UserModuleProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='module_progress')
     module = models.ForeignKey(Module, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='LOCKED')
+    # Completed / total exercises of the module's unit, maintained on each completion
+    completed_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['user', 'module']
+        indexes = [
+            models.Index(fields=['user', 'module', 'status'], name='progress_user_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.module.title}: {self.status}"
+
+class UserProgressBitmap(models.Model):
+    """
+    Compact copy of a user's UserModuleProgress rows for one curriculum version.
+    Master modules are packed as one 4-bit status code per module, indexed by
+    their topological rank in the CurriculumGraph; AI modules live in `overlay`.
+    UserModuleProgress stays the source of truth: the bitmap is rebuilt whenever
+    the user's progress version or the curriculum version changes.
+    """
+    STATUS_CODES = {'LOCKED': 1, 'AVAILABLE': 2, 'COMPLETED': 3, 'STUCK': 4}  # 0: no progress row
+    CODE_STATUSES = {code: status for status, code in STATUS_CODES.items()}
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress_bitmaps')
+    curriculum = models.CharField(max_length=40, help_text="CurriculumGraph fingerprint")
+    progress_version = models.BigIntegerField()
+    curriculum_version = models.BigIntegerField(default=0)
+    statuses = models.BinaryField()
+    overlay = models.JSONField(default=dict, help_text="Statuses of modules outside the master graph")
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'curriculum']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.curriculum[:8]} (v{self.progress_version})"
+
+    @classmethod
+    def pack(cls, graph, statuses):
+        """
+        Encodes {module_id: status} into (packed bytes, overlay dict) for the given graph.
+        """
+        packed = bytearray((len(graph) + 1) // 2)
+        overlay = {}
+        for module_id, status in statuses.items():
+            rank = graph.rank.get(module_id)
+            if rank is None:
+                overlay[str(module_id)] = status
+                continue
+            code = cls.STATUS_CODES[status]
+            packed[rank // 2] |= code << (4 * (rank % 2))
+        return bytes(packed), overlay
+
+    def unpack(self, graph):
+        """
+        Decodes the bitmap back into {module_id: status}.
+        """
+        statuses = {}
+        packed = bytes(self.statuses)
+        for rank, module_id in enumerate(graph.module_ids):
+            code = (packed[rank // 2] >> (4 * (rank % 2))) & 0xF
+            if code:
+                statuses[module_id] = self.CODE_STATUSES[code]
+        statuses.update({int(module_id): status for module_id, status in self.overlay.items()})
+        return statuses
+
+class ReinforcementJob(models.Model):
+    """
+    Queued AI work for a user stuck on an exercise (adaptive feedback and,
+    optionally, a reinforcement module). Consumed by the run_reinforcement_worker command.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reinforcement_jobs')
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='reinforcement_jobs')
+    exercise_type = models.CharField(max_length=20)
+    master_exercise = models.ForeignKey(MasterExercise, on_delete=models.CASCADE, null=True, blank=True, related_name='reinforcement_jobs')
+    ai_exercise = models.ForeignKey(AIExercise, on_delete=models.CASCADE, null=True, blank=True, related_name='reinforcement_jobs')
+    error_log = models.JSONField(default=list)
+    inject_module = models.BooleanField(default=True, help_text="False in review mode and for AI exercises (feedback only)")
+    include_feedback = models.BooleanField(default=True, help_text="False when the client streams the feedback itself")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    feedback = models.TextField(blank=True, default='')
+    result_module = models.ForeignKey(Module, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reinforcement_job_queue_idx'),
+        ]
+        constraints = [
+            # Single-flight: at most one active job per user and exercise
+            # (jobs of the same module and type still share one generation, see claim_batch)
+            models.UniqueConstraint(
+                fields=['user', 'master_exercise'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING'], master_exercise__isnull=False),
+                name='unique_active_reinforcement_job'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'ai_exercise'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING'], ai_exercise__isnull=False),
+                name='unique_active_ai_reinforcement_job'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} ({self.user.username} - {self.module.title}): {self.status}"
+
+    @property
+    def exercise(self):
+        return self.ai_exercise if self.ai_exercise_id else self.master_exercise
+
+class ReinforcementCacheEntry(models.Model):
+    """
+    LLM-generated reinforcement content shared across users. Keyed by the source module,
+    the failed exercise type, a normalized signature of the recent errors and the
+    fingerprint of the curriculum graph it was generated for.
+    """
+    source_module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='reinforcement_cache_entries')
+    exercise_type = models.CharField(max_length=20)
+    error_signature = models.CharField(max_length=40)
+    curriculum = models.CharField(max_length=40, help_text="CurriculumGraph.fingerprint")
+    module_title = models.CharField(max_length=200)
+    exercises = models.JSONField(default=list)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('source_module', 'exercise_type', 'error_signature', 'curriculum')
+        indexes = [
+            models.Index(fields=['last_used_at'], name='reinforcement_cache_lru_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source_module.title} - {self.exercise_type} ({self.error_signature[:8]}): {self.hits} hits"
+
+class ReinforcementBankEntry(models.Model):
+    """
+    Pre-generated, error-agnostic reinforcement content for a master module and
+    exercise type (filled offline by the build_reinforcement_bank command).
+    """
+    source_module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='reinforcement_bank_entries')
+    exercise_type = models.CharField(max_length=20)
+    module_title = models.CharField(max_length=200)
+    exercises = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('source_module', 'exercise_type')
+
+    def __str__(self):
+        return f"{self.source_module.title} - {self.exercise_type}"
+
+class FeedbackHintEntry(models.Model):
+    """
+    LLM feedback for a master exercise shared across users, keyed by a normalized
+    signature of the wrong answers it was written for (see MeetFlowV1/feedback_hints.py).
+    """
+    exercise = models.ForeignKey(MasterExercise, on_delete=models.CASCADE, related_name='feedback_hints')
+    answers_signature = models.CharField(max_length=40)
+    hint = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('exercise', 'answers_signature')
+        indexes = [
+            models.Index(fields=['last_used_at'], name='feedback_hint_lru_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.exercise} ({self.answers_signature[:8]}): {self.hits} hits"
+
+class VersionCounter(models.Model):
+    """
+    Version counters behind map snapshots, ETags and the in-process CurriculumGraph
+    (see MeetFlowV1/versioning.py). Kept in the database so every process (web workers,
+    the reinforcement worker, management commands) agrees on them, and bumped in the
+    same transaction as the change they describe.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
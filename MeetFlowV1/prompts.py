@@ -0,0 +1,145 @@
+import json
+import logging
+import re
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough tokenizer-free estimate, good enough to keep prompts under a budget
+CHARS_PER_TOKEN = 4
+# Exercise fields worth sending to the LLM (seed_curriculum stores them in content)
+EXERCISE_PROMPT_FIELDS = ('title', 'instruction', 'question', 'ai_focus')
+# Distinct recent errors sent with a feedback request
+FEEDBACK_ERRORS = 3
+# Progressively shorter error entries tried before dropping the oldest ones
+ERROR_ENTRY_CHARS = (300, 120, 40)
+
+FEEDBACK_TEMPLATE = """
+The user is failing this exercise: {exercise_type}
+Content: {content}
+Recent errors: {errors}
+
+Provide short (max 2 sentences) and encouraging feedback in English.
+Explain the concept briefly without giving the answer directly.
+"""
+
+REINFORCEMENT_TEMPLATE = """
+Generate a reinforcement module for a user who failed in the module: {module_title}.
+The user failed a practical exercise of type: {exercise_type}.
+Recent Errors: {errors}
+
+Instead of practical exercises, generate 3 THEORETICAL exercises (Multiple Choice Questions) to help the user understand the underlying concepts related to the mistake.
+Each exercise must have exactly 4 options: a, b, c, d.
+
+Respond ONLY with a valid JSON string with this exact structure:
+{{
+    "module_title": "Theoretical Reinforcement: {module_title}",
+    "exercises": [
+        {{
+            "type": "THEORY",
+            "content": {{
+                "instruction": "Select the correct option based on the theoretical concept.",
+                "question": "...",
+                "options": {{"a": "...", "b": "...", "c": "...", "d": "..."}}
+            }},
+            "solution": {{"expected": "a", "explanation": "..."}}
+        }},
+        ... (total 3 exercises)
+    ]
+}}
+Ensure all 3 exercises are of type THEORY and provide clear educational value based on the user's mistake context.
+"""
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _truncate(text, max_chars):
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def exercise_prompt_content(content):
+    """
+    The fields of an exercise that help the LLM; falls back to the raw content if none is present.
+    """
+    fields = {field: content[field] for field in EXERCISE_PROMPT_FIELDS if content.get(field)}
+    if fields:
+        return fields
+    return _truncate(json.dumps(content, ensure_ascii=False), ERROR_ENTRY_CHARS[0])
+
+
+def compact_errors(error_log, limit):
+    """
+    The `limit` most recent distinct errors (compared ignoring case and whitespace), oldest first.
+    """
+    errors = []
+    seen = set()
+    for entry in reversed(error_log or []):
+        text = entry if isinstance(entry, str) else json.dumps(entry, ensure_ascii=False)
+        text = re.sub(r'\s+', ' ', text).strip()
+        key = text.lower()
+        if text and key not in seen:
+            seen.add(key)
+            errors.append(text)
+        if len(errors) == limit:
+            break
+    return errors[::-1]
+
+
+def _fit_errors(render, errors, budget):
+    """
+    Renders with as many (then as long) error entries as the token budget allows,
+    dropping the oldest ones first. The template itself is never cut.
+    """
+    for start in range(len(errors)):
+        for max_chars in ERROR_ENTRY_CHARS:
+            prompt = render([_truncate(error, max_chars) for error in errors[start:]])
+            if estimate_tokens(prompt) <= budget:
+                return prompt
+    prompt = render([])
+    if estimate_tokens(prompt) > budget:
+        logger.warning("Prompt over budget: ~%s tokens for a budget of %s", estimate_tokens(prompt), budget)
+    return prompt
+
+
+def _fit_content(render, content, budget):
+    """
+    Shortens exercise content that leaves no room for the errors within the budget,
+    keeping space for the shortest form of every error entry.
+    """
+    reserved = FEEDBACK_ERRORS * (ERROR_ENTRY_CHARS[-1] + 4)
+    if len(render([], content)) + reserved <= budget * CHARS_PER_TOKEN:
+        return content
+    available = budget * CHARS_PER_TOKEN - len(render([], '')) - reserved
+    return _truncate(str(content), max(available, ERROR_ENTRY_CHARS[-1]))
+
+
+def build_feedback_messages(exercise, error_log):
+    budget = settings.LLM_PROMPT_BUDGET_FEEDBACK
+
+    def render_with(errors, content):
+        return FEEDBACK_TEMPLATE.format(exercise_type=exercise.type, content=content, errors=errors)
+
+    content = _fit_content(render_with, exercise_prompt_content(exercise.content or {}), budget)
+
+    def render(errors):
+        return render_with(errors, content)
+
+    prompt = _fit_errors(render, compact_errors(error_log, FEEDBACK_ERRORS), budget)
+    return [{"role": "user", "content": prompt}]
+
+
+def build_reinforcement_messages(module_title, exercise_type, error_log):
+    def render(errors):
+        return REINFORCEMENT_TEMPLATE.format(
+            module_title=module_title,
+            exercise_type=exercise_type,
+            errors=errors or 'not available, target the most common mistakes'
+        )
+
+    prompt = _fit_errors(render, compact_errors(error_log, 5), settings.LLM_PROMPT_BUDGET_REINFORCEMENT)
+    return [
+        {"role": "system", "content": "You are a specialized assistant that only outputs raw JSON."},
+        {"role": "user", "content": prompt}
+    ]
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import ReinforcementCacheEntry, ReinforcementBankEntry
+
+# Same window of recent errors the reinforcement prompt is built from
+SIGNATURE_ERRORS = 5
+
+
+def _normalize_error(entry):
+    if not isinstance(entry, str):
+        entry = json.dumps(entry, sort_keys=True)
+    return re.sub(r'\s+', ' ', entry).strip().lower()
+
+
+def error_signature(error_log):
+    """
+    Hash of the recent errors, insensitive to case, whitespace, order and repetitions,
+    so students failing an exercise the same way share one entry.
+    """
+    errors = sorted({_normalize_error(entry) for entry in (error_log or [])[-SIGNATURE_ERRORS:]})
+    return hashlib.sha1(json.dumps(errors).encode()).hexdigest()
+
+
+def get_cached_reinforcement(source_module, exercise_type, signature, graph):
+    """
+    Returns the cached {'module_title', 'exercises'} for the key, or None.
+    """
+    fresh_after = timezone.now() - timedelta(days=settings.REINFORCEMENT_CACHE_TTL_DAYS)
+    entry = ReinforcementCacheEntry.objects.filter(
+        source_module=source_module,
+        exercise_type=exercise_type,
+        error_signature=signature,
+        curriculum=graph.fingerprint,
+        created_at__gte=fresh_after
+    ).only('id', 'module_title', 'exercises').first()
+    if entry is None:
+        return None
+
+    ReinforcementCacheEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return {'module_title': entry.module_title, 'exercises': entry.exercises}
+
+
+def store_reinforcement(source_module, exercise_type, signature, graph, data):
+    """
+    Caches freshly generated reinforcement content and evicts the least recently used
+    entries beyond REINFORCEMENT_CACHE_MAX_ENTRIES.
+    """
+    ReinforcementCacheEntry.objects.update_or_create(
+        source_module=source_module,
+        exercise_type=exercise_type,
+        error_signature=signature,
+        curriculum=graph.fingerprint,
+        defaults={
+            'module_title': data['module_title'],
+            'exercises': data['exercises'],
+            'created_at': timezone.now(),
+            'last_used_at': timezone.now(),
+        }
+    )
+    evict_reinforcement_cache()
+
+
+def evict_reinforcement_cache(max_entries=None):
+    max_entries = settings.REINFORCEMENT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    stale_ids = list(
+        ReinforcementCacheEntry.objects.order_by('-last_used_at', '-id').values_list('id', flat=True)[max_entries:]
+    )
+    if stale_ids:
+        ReinforcementCacheEntry.objects.filter(id__in=stale_ids).delete()
+    return len(stale_ids)
+
+
+def get_bank_reinforcement(source_module, exercise_type):
+    """
+    Returns the pre-generated {'module_title', 'exercises'} of a master module and exercise type, or None.
+    """
+    entry = ReinforcementBankEntry.objects.filter(
+        source_module=source_module,
+        exercise_type=exercise_type
+    ).only('module_title', 'exercises').first()
+    if entry is None:
+        return None
+    return {'module_title': entry.module_title, 'exercises': entry.exercises}
+
+
+def store_bank_reinforcement(source_module_id, exercise_type, data):
+    ReinforcementBankEntry.objects.update_or_create(
+        source_module_id=source_module_id,
+        exercise_type=exercise_type,
+        defaults={'module_title': data['module_title'], 'exercises': data['exercises']}
+    )
@@ -125,7 +125,7 @@ class ModuleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Module
-        fields = ['id', 'unit_id', 'title', 'order', 'user', 'is_ai_generated', 'source_module', 'reinforcement_type', 'position_x', 'position_y', 'outgoing_dependencies', 'status', 'completion_percentage']
+        fields = ['id', 'unit_id', 'title', 'order', 'user', 'is_ai_generated', 'source_module', 'reinforcement_type', 'display_id', 'position_x', 'position_y', 'outgoing_dependencies', 'status', 'completion_percentage']
 
     def get_unit_id(self, obj):
         try:
@@ -134,7 +134,15 @@ class ModuleSerializer(serializers.ModelSerializer):
         except Exception:
             return None
 
+    def _resolved_state(self, obj):
+        # Precomputed by resolve_module_states (e.g. from MapProgressView)
+        return self.context.get('module_states', {}).get(obj.id)
+
     def get_status(self, obj):
+        state = self._resolved_state(obj)
+        if state is not None:
+            return state['status']
+
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             user = request.user
@@ -151,6 +159,10 @@ class ModuleSerializer(serializers.ModelSerializer):
         return 'LOCKED'
 
     def get_completion_percentage(self, obj):
+        state = self._resolved_state(obj)
+        if state is not None:
+            return state['completion_percentage']
+
         request = self.context.get('request')
         if not (request and hasattr(request, 'user') and request.user.is_authenticated):
             return 0.0
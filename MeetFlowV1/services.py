@@ -1,9 +1,21 @@
 import openai
 import json
-import os
-from django.db import transaction
-from django.db.models import Q
-from .models import Module, UserModuleProgress, Unit, MasterExercise, AIExercise, UserExerciseAttempt, ModuleDependency
+import re
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from django.db.models import Q, F, Count, Exists, OuterRef
+from .models import (
+    Module, UserModuleProgress, Unit, MasterExercise, AIExercise, UserExerciseAttempt, ModuleDependency,
+    UserProgressBitmap, AttemptEvent,
+)
+from .versioning import bump_progress_version, get_progress_version
+from .graph import get_curriculum_graph
+from .llm import get_llm_client
+from .metrics import record_reinforcement_outcome, record_feedback_outcome
+from .feedback_hints import get_feedback_hint, store_feedback_hint
+from .prompts import build_feedback_messages, build_reinforcement_messages
+from .reinforcement_cache import error_signature, get_cached_reinforcement, store_reinforcement, get_bank_reinforcement
 
 class ExerciseEvaluator:
     @staticmethod
@@ -90,88 +102,174 @@ class ExerciseEvaluator:
 
     # _evaluate_code is removed as logic is now in evaluate() for CODE type
 
+# Map layout of AI reinforcement modules, per reinforcement type:
+# sub-index of the display ID ("2.1") and vertical offset between the source and the next master module
+REINFORCEMENT_TYPE_INDEX = {
+    'BLANKS': 1,
+    'PARSONS': 2,
+    'DEBUG': 3,
+    'CODE': 4
+}
+REINFORCEMENT_OFFSET_Y = {'BLANKS': -60, 'PARSONS': -20, 'DEBUG': 20, 'CODE': 60}
+
+
+def reinforcement_display_id(source_module_id, reinforcement_type):
+    """
+    Display ID of an AI module on the map: "SourceID.SubIndex" (e.g. "2.1").
+    """
+    return f"{source_module_id}.{REINFORCEMENT_TYPE_INDEX.get(reinforcement_type, 0)}"
+
+
+def reinforcement_edge_label(target_module):
+    if target_module.is_ai_generated:
+        return f"Reinforcement: {target_module.reinforcement_type}"
+    return "AI Reinforcement"
+
+
+def reinforcement_position(graph, source_module, reinforcement_type):
+    """
+    Places an AI module halfway between its source and the next master module,
+    or next to the source when the source has no master child.
+    """
+    next_master_ids = graph.child_ids(source_module.id)
+    if not next_master_ids:
+        return source_module.position_x + 100, source_module.position_y + 50
+
+    target_x, target_y = graph.position(next_master_ids[0])
+    mid_x = (source_module.position_x + target_x) / 2
+    mid_y = (source_module.position_y + target_y) / 2
+    return mid_x, mid_y + REINFORCEMENT_OFFSET_Y.get(reinforcement_type, 0)
+
+
+FEEDBACK_FALLBACK = "I've noticed you're having trouble with this concept. Don't give up!"
+
+
 class AIService:
     @staticmethod
-    def _call_llm(messages, response_format_json=False):
+    def _call_llm(messages, response_format_json=False, call_site='other'):
         """
-        Internal helper to call the LLM using httpx for maximum flexibility.
-        Handles optional model and no-api-key scenarios better than the standard library.
+        Internal helper to call the LLM through the process-wide pooled client.
+        Raises on failure (or immediately while the circuit breaker is open) so callers fall back.
         """
-        import httpx
-        
-        base_url = os.getenv("OPENAI_API_BASE_URL") or "https://api.openai.com/v1"
-        api_key = os.getenv("OPENAI_API_KEY")
-        model = os.getenv("OPENAI_MODEL")
-        
-        # Clean base_url
-        if base_url.endswith("/chat/completions"):
-            base_url = base_url.replace("/chat/completions", "")
-        elif base_url.endswith("/chat/completions/"):
-            base_url = base_url.replace("/chat/completions/", "")
-        
-        url = f"{base_url.rstrip('/')}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-        }
-        if api_key:
-            headers["Authorization"] = f"Bearer {api_key}"
-            
-        payload = {
-            "messages": messages,
-        }
-        if model:
-            payload["model"] = model
-        
-        if response_format_json:
-            payload["response_format"] = {"type": "json_object"}
-            
-        print(f"[AI DEBUG] Calling {url} | Model: {model or 'default'} | API Key: {'Set' if api_key else 'Not Set'}")
-        
+        return get_llm_client().chat(messages, response_format_json=response_format_json, call_site=call_site)
+
+    @staticmethod
+    def _stream_llm(messages, call_site='other'):
+        """
+        Streaming counterpart of _call_llm: yields the completion text as it arrives.
+        """
+        return get_llm_client().stream_chat(messages, call_site=call_site)
+
+    @staticmethod
+    def _feedback_messages(exercise, user_error_log):
+        return build_feedback_messages(exercise, user_error_log)
+
+    @staticmethod
+    def get_adaptive_feedback(exercise, user_error_log, use_hint_store=True):
+        """
+        Personalized feedback based on error history: the stored hint for the same wrong
+        answers when there is one, otherwise the LLM (whose answer is then stored).
+        Reinforcement jobs pass use_hint_store=False and use the store from their own thread.
+        """
+        if use_hint_store:
+            hint = get_feedback_hint(exercise, user_error_log)
+            if hint is not None:
+                record_feedback_outcome('hint_hit')
+                return hint
+
         try:
-            with httpx.Client(trust_env=False) as client:
-                response = client.post(url, headers=headers, json=payload, timeout=60.0)
-            response.raise_for_status()
-            data = response.json()
-            return data['choices'][0]['message']['content']
+            feedback = AIService._call_llm(AIService._feedback_messages(exercise, user_error_log), call_site='feedback')
         except Exception as e:
-            error_detail = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                error_detail += f" | Body: {e.response.text}"
-            raise Exception(f"LLM Call failed: {error_detail}")
+            print(f"[AI DEBUG] Feedback generation failed: {str(e)}")
+            record_feedback_outcome('fallback')
+            return FEEDBACK_FALLBACK
+
+        record_feedback_outcome('generated')
+        if use_hint_store:
+            store_feedback_hint(exercise, user_error_log, feedback)
+        return feedback
 
     @staticmethod
-    def get_adaptive_feedback(exercise, user_error_log):
+    def stream_adaptive_feedback(exercise, user_error_log):
         """
-        Calls the LLM to get personalized feedback based on error history.
+        Same as get_adaptive_feedback, but yields the feedback token by token
+        (a stored hint comes in one piece). Falls back to the static message
+        if the LLM fails before the first token.
         """
+        hint = get_feedback_hint(exercise, user_error_log)
+        if hint is not None:
+            record_feedback_outcome('hint_hit')
+            yield hint
+            return
+
+        streamed = []
         try:
-            prompt = f"""
-            The user is failing this exercise: {exercise.type}
-            Content: {exercise.content}
-            Recent errors: {user_error_log[-3:]}
-            
-            Provide short (max 2 sentences) and encouraging feedback in English.
-            Explain the concept briefly without giving the answer directly.
-            """
-            return AIService._call_llm([{"role": "user", "content": prompt}])
+            for delta in AIService._stream_llm(
+                AIService._feedback_messages(exercise, user_error_log), call_site='feedback_stream'
+            ):
+                streamed.append(delta)
+                yield delta
         except Exception as e:
-            print(f"[AI DEBUG] Feedback generation failed: {str(e)}")
-            return "I've noticed you're having trouble with this concept. Don't give up!"
+            print(f"[AI DEBUG] Feedback streaming failed: {str(e)}")
+            if not streamed:
+                record_feedback_outcome('fallback')
+                yield FEEDBACK_FALLBACK
+            return
+
+        record_feedback_outcome('generated')
+        store_feedback_hint(exercise, user_error_log, ''.join(streamed))
 
     @staticmethod
-    def inject_reinforcement_module(user, current_module, exercise_type, user_error_log):
+    def _generate_reinforcement_content(current_module, exercise_type, user_error_log):
         """
-        Generates a reinforcement module for a specific exercise type and injects it.
-        Limit: 4 AI modules per original module.
-        Exercises: 3 of the same type.
+        Asks the LLM for the title and exercises of a reinforcement module.
+        Raises if the call fails or the response is not a usable module.
         """
-        print(f"\n[AI DEBUG] Starting reinforcement injection for User: {user.username}, Module: {current_module.title}, Type: {exercise_type}")
+        try:
+            raw_content = AIService._call_llm(
+                build_reinforcement_messages(current_module.title, exercise_type, user_error_log),
+                call_site='reinforcement'
+            )
+        except Exception:
+            record_reinforcement_outcome('llm_error')
+            raise
+
+        # Robust JSON cleanup
+        clean_json = raw_content.strip()
+        
+        # 1. Remove markdown code blocks if present
+        json_match = re.search(r'\{.*\}', clean_json, re.DOTALL)
+        if json_match:
+            clean_json = json_match.group(0)
         
+        try:
+            data = json.loads(clean_json)
+            print(f"[AI DEBUG] LLM SUCCESS: Parsed JSON with {len(data.get('exercises', []))} exercises.")
+        except json.JSONDecodeError as e:
+            print(f"[AI DEBUG] JSON Parse Error: {str(e)} | Content: {clean_json[:100]}...")
+            record_reinforcement_outcome('parse_error')
+            raise e
+
+        # Never cache or inject a partial module
+        exercises = data.get('exercises') if isinstance(data, dict) else None
+        if not exercises or not data.get('module_title') or not isinstance(exercises, list) or not all(
+            isinstance(ex, dict) and {'type', 'content', 'solution'} <= ex.keys() for ex in exercises
+        ):
+            record_reinforcement_outcome('parse_error')
+            raise ValueError("LLM response does not match the reinforcement module structure")
+        record_reinforcement_outcome('generated')
+        return data
+
+    @staticmethod
+    def can_inject_reinforcement(user, current_module, exercise_type):
+        """
+        Limit: 4 AI modules per original module, one per exercise type, never from an AI module.
+        """
         # 0. AI modules should NOT generate more AI modules
         if current_module.is_ai_generated:
             print(f"[AI DEBUG] SKIP: Cannot generate reinforcement for an already AI-generated module.")
-            return None
+            record_reinforcement_outcome('skipped')
+            return False
 
         # 1. Check limit: max 4 AI modules per original module for this user
         ai_modules_count = Module.objects.filter(
@@ -182,7 +280,8 @@ class AIService:
         
         if ai_modules_count >= 4:
             print(f"[AI DEBUG] LIMIT REACHED: User already has {ai_modules_count} AI modules for this source module.")
-            return None
+            record_reinforcement_outcome('limit_reached')
+            return False
 
         # 2. Check if an AI module for THIS exercise type already exists
         existing_ai_module = Module.objects.filter(
@@ -194,121 +293,139 @@ class AIService:
 
         if existing_ai_module:
             print(f"[AI DEBUG] DUPLICATE: AI reinforcement for {exercise_type} already exists for this module.")
-            return None
+            record_reinforcement_outcome('duplicate')
+            return False
+        return True
 
-        try:
-            prompt = f"""
-            Generate a reinforcement module for a user who failed in the module: {current_module.title}.
-            The user failed a practical exercise of type: {exercise_type}.
-            Recent Errors: {user_error_log[-5:]}
-            
-            Instead of practical exercises, generate 3 THEORETICAL exercises (Multiple Choice Questions) to help the user understand the underlying concepts related to the mistake.
-            Each exercise must have exactly 4 options: a, b, c, d.
-            
-            Respond ONLY with a valid JSON string with this exact structure:
-            {{
-                "module_title": "Theoretical Reinforcement: {current_module.title}",
-                "exercises": [
-                    {{ 
-                        "type": "THEORY", 
-                        "content": {{
-                            "instruction": "Select the correct option based on the theoretical concept.",
-                            "question": "...", 
-                            "options": {{
-                                "a": "...",
-                                "b": "...",
-                                "c": "...",
-                                "d": "..."
-                            }}
-                        }}, 
-                        "solution": {{ 
-                            "expected": "a", 
-                            "explanation": "..." 
-                        }} 
-                    }},
-                    ... (total 3 exercises)
-                ]
-            }}
-            Ensure all 3 exercises are of type THEORY and provide clear educational value based on the user's mistake context.
-            """
-            raw_content = AIService._call_llm([
-                {"role": "system", "content": "You are a specialized assistant that only outputs raw JSON."},
-                {"role": "user", "content": prompt}
-            ])
+    @staticmethod
+    def lookup_reinforcement_content(current_module, exercise_type, signature, graph):
+        """
+        Returns stored reinforcement content without calling the LLM, or None.
+        """
+        # Students failing the same exercise the same way share the generated content
+        data = get_cached_reinforcement(current_module, exercise_type, signature, graph)
+        if data is not None:
+            print(f"[AI DEBUG] CACHE HIT: Reusing {len(data['exercises'])} exercises (signature {signature[:8]}).")
+            record_reinforcement_outcome('cache_hit')
+            return data
+
+        # Then the offline bank (build_reinforcement_bank)
+        data = get_bank_reinforcement(current_module, exercise_type)
+        if data is not None:
+            print(f"[AI DEBUG] BANK HIT: Using {len(data['exercises'])} pre-generated exercises.")
+            record_reinforcement_outcome('bank_hit')
+        return data
 
-            # Robust JSON cleanup
-            clean_json = raw_content.strip()
-            
-            # 1. Remove markdown code blocks if present
-            import re
-            json_match = re.search(r'\{.*\}', clean_json, re.DOTALL)
-            if json_match:
-                clean_json = json_match.group(0)
-            
+    @staticmethod
+    def create_reinforcement_module(user, current_module, exercise_type, data, graph):
+        """
+        Creates the AI module, its exercises and progress, and links it into the user's graph.
+        """
+        position_x, position_y = reinforcement_position(graph, current_module, exercise_type)
+
+        with transaction.atomic():
+            # 3. Create the new Module (final map layout is computed once, here)
             try:
-                data = json.loads(clean_json)
-                print(f"[AI DEBUG] LLM SUCCESS: Parsed JSON with {len(data.get('exercises', []))} exercises.")
-            except json.JSONDecodeError as e:
-                print(f"[AI DEBUG] JSON Parse Error: {str(e)} | Content: {clean_json[:100]}...")
-                raise e
-
-            with transaction.atomic():
-                # 3. Create the new Module
-                new_module = Module.objects.create(
+                with transaction.atomic():
+                    new_module = Module.objects.create(
+                        user=user,
+                        title=data['module_title'],
+                        order=current_module.order + 1,
+                        is_ai_generated=True,
+                        source_module=current_module,
+                        reinforcement_type=exercise_type, # Keep track of what triggered it
+                        position_x=position_x,
+                        position_y=position_y,
+                        display_id=reinforcement_display_id(current_module.id, exercise_type)
+                    )
+            except IntegrityError:
+                # unique_ai_reinforcement_module: a concurrent injection won the race
+                print(f"[AI DEBUG] DUPLICATE: AI reinforcement for {exercise_type} was created concurrently.")
+                record_reinforcement_outcome('duplicate')
+                return Module.objects.get(
                     user=user,
-                    title=data['module_title'],
-                    order=current_module.order + 1,
-                    is_ai_generated=True,
                     source_module=current_module,
-                    reinforcement_type=exercise_type, # Keep track of what triggered it
-                    position_x=current_module.position_x + 100,
-                    position_y=current_module.position_y + 100
+                    reinforcement_type=exercise_type,
+                    is_ai_generated=True
                 )
 
-                # Create a dummy unit for these exercises
-                unit = Unit.objects.create(
-                    module=new_module,
-                    title="Theoretical Review",
-                    order=1
-                )
-
-                # 4. Create the 3 exercises
-                for idx, ex_data in enumerate(data['exercises']):
-                    AIExercise.objects.create(
-                        user=user,
-                        source_unit=unit,
-                        type=ex_data['type'], # Should be THEORY
-                        content=ex_data['content'],
-                        solution=ex_data['solution'],
-                        ai_metadata={"reinforcement_for": current_module.id}
-                    )
-                
-                print(f"[AI DEBUG] DATABASE: Module and 3 exercises created successfully (ID: {new_module.id}).")
+            # Create a dummy unit for these exercises
+            unit = Unit.objects.create(
+                module=new_module,
+                title="Theoretical Review",
+                order=1
+            )
 
-                # Initialize progress as AVAILABLE for the new AI module
-                UserModuleProgress.objects.get_or_create(
+            # 4. Create the 3 exercises (one INSERT)
+            AIExercise.objects.bulk_create([
+                AIExercise(
                     user=user,
-                    module=new_module,
-                    defaults={'status': 'AVAILABLE'}
+                    source_unit=unit,
+                    type=ex_data['type'], # Should be THEORY
+                    content=ex_data['content'],
+                    solution=ex_data['solution'],
+                    ai_metadata={"reinforcement_for": current_module.id}
                 )
+                for ex_data in data['exercises']
+            ])
+            
+            print(f"[AI DEBUG] DATABASE: Module and {len(data['exercises'])} exercises created successfully (ID: {new_module.id}).")
+
+            # Initialize progress as AVAILABLE for the new AI module
+            UserModuleProgress.objects.bulk_create([
+                UserModuleProgress(
+                    user=user, module=new_module, status='AVAILABLE', total_count=len(data['exercises'])
+                )
+            ], ignore_conflicts=True)
 
-                # 5. Graph re-link
-                ModuleDependency.objects.get_or_create(
+            # 5. Graph re-link: the incoming edge plus the AI module on every master edge
+            # leaving the source module, in one INSERT
+            edges = [
+                ModuleDependency(
                     source_node=current_module,
                     target_node=new_module,
-                    user=user
+                    user=user,
+                    label=reinforcement_edge_label(new_module)
                 )
-                
-                outgoing = ModuleDependency.objects.filter(source_node=current_module, user=None)
-                for dep in outgoing:
-                    ModuleDependency.objects.get_or_create(
-                        source_node=new_module,
-                        target_node=dep.target_node,
-                        user=user
-                    )
-                
-                print("[AI DEBUG] GRAPH: Dependencies linked correctly.")
-                return new_module
+            ]
+            edges.extend(
+                ModuleDependency(
+                    source_node=new_module,
+                    target_node_id=target_id,
+                    user=user,
+                    label="AI Reinforcement",
+                    bypassed_source=current_module
+                )
+                for target_id in graph.child_ids(current_module.id)
+            )
+            ModuleDependency.objects.bulk_create(edges, ignore_conflicts=True)
+            
+            print("[AI DEBUG] GRAPH: Dependencies linked correctly.")
+            bump_progress_version(user.id)
+        return new_module
+
+    @staticmethod
+    def inject_reinforcement_module(user, current_module, exercise_type, user_error_log):
+        """
+        Generates a reinforcement module for a specific exercise type and injects it.
+        Limit: 4 AI modules per original module.
+        Exercises: 3 of the same type.
+        """
+        print(f"\n[AI DEBUG] Starting reinforcement injection for User: {user.username}, Module: {current_module.title}, Type: {exercise_type}")
+        
+        if not AIService.can_inject_reinforcement(user, current_module, exercise_type):
+            return None
+
+        graph = get_curriculum_graph()
+        signature = error_signature(user_error_log)
+
+        try:
+            data = AIService.lookup_reinforcement_content(current_module, exercise_type, signature, graph)
+            if data is None:
+                data = AIService._generate_reinforcement_content(current_module, exercise_type, user_error_log)
+                store_reinforcement(current_module, exercise_type, signature, graph, data)
+
+            return AIService.create_reinforcement_module(user, current_module, exercise_type, data, graph)
         except Exception as e:
             error_msg = str(e)
             if hasattr(e, 'response') and hasattr(e.response, 'text'):
@@ -316,7 +433,6 @@ class AIService:
             print(f"[AI DEBUG] LLM ERROR: {error_msg}")
             return None
 
-
 def validate_exercise_response(exercise_id, user_payload, is_ai=False):
     """
     Validates the user response for a specific exercise.
@@ -354,26 +470,125 @@ def is_module_unlocked(user, module):
     if progress and progress.status in ['COMPLETED', 'STUCK', 'AVAILABLE']:
         return True
 
-    # Check incoming dependencies
-    incoming_deps = ModuleDependency.objects.filter(
-        Q(target_node=module) & (Q(user__isnull=True) | Q(user=user))
+    # Has dependencies: check if ALL are completed (no dependencies: it's a starting point)
+    return all_parents_completed(user, module.id)
+
+def all_parents_completed(user, module_id):
+    """
+    Checks in a single query that every incoming dependency (master + user-specific)
+    of a module comes from a module the user has COMPLETED.
+    Modules without dependencies are trivially satisfied.
+    """
+    completed = UserModuleProgress.objects.filter(
+        user=user,
+        module_id=OuterRef('source_node_id'),
+        status='COMPLETED'
+    )
+    pending_parents = ModuleDependency.objects.filter(
+        Q(target_node_id=module_id) & (Q(user__isnull=True) | Q(user=user))
+    ).filter(~Exists(completed))
+    return not pending_parents.exists()
+
+def load_progress_statuses(user, graph=None):
+    """
+    Returns { module_id: status } for every progress row of the user.
+    With PROGRESS_BITMAP_ENABLED the statuses are decoded from the user's
+    UserProgressBitmap in one fetch, rebuilding it from the rows when it is stale.
+    """
+    if not settings.PROGRESS_BITMAP_ENABLED:
+        return dict(UserModuleProgress.objects.filter(user=user).values_list('module_id', 'status'))
+
+    graph = graph or get_curriculum_graph()
+    version = get_progress_version(user.id)
+    bitmap = UserProgressBitmap.objects.filter(user=user, curriculum=graph.fingerprint).first()
+    # Re-seeding the same curriculum keeps the fingerprint but replaces every progress row
+    if bitmap and bitmap.progress_version == version and bitmap.curriculum_version == graph.version:
+        return bitmap.unpack(graph)
+
+    # Stale or missing: derive it again from the source of truth
+    statuses = dict(UserModuleProgress.objects.filter(user=user).values_list('module_id', 'status'))
+    packed, overlay = UserProgressBitmap.pack(graph, statuses)
+    if bitmap is None:
+        # Bitmaps of previous curriculum versions can no longer be decoded
+        UserProgressBitmap.objects.filter(user=user).exclude(curriculum=graph.fingerprint).delete()
+    UserProgressBitmap.objects.bulk_create(
+        [UserProgressBitmap(
+            user=user, curriculum=graph.fingerprint, progress_version=version,
+            curriculum_version=graph.version, statuses=packed, overlay=overlay
+        )],
+        update_conflicts=True,
+        unique_fields=['user', 'curriculum'],
+        update_fields=['progress_version', 'curriculum_version', 'statuses', 'overlay', 'last_updated'],
     )
-    
-    if not incoming_deps.exists():
-        # No dependencies: it's a starting point
-        return True
+    return statuses
 
-    # Has dependencies: check if ALL are completed
-    for dep in incoming_deps:
-        dep_completed = UserModuleProgress.objects.filter(
-            user=user, 
-            module=dep.source_node, 
-            status='COMPLETED'
-        ).exists()
-        if not dep_completed:
-            return False
-            
-    return True
+def resolve_module_states(user, modules, user_graph=None):
+    """
+    Computes the status and completion percentage of every module in a user's graph.
+    Progress, dependencies and exercise/attempt counts are loaded once and the graph
+    is resolved in memory, so the number of queries does not depend on the number of modules.
+    Returns: { module_id: {"status": ..., "completion_percentage": ...} }
+    """
+    modules = list(modules)
+    if not user.is_authenticated:
+        return {m.id: {'status': 'LOCKED', 'completion_percentage': 0.0} for m in modules}
+
+    # 1. All progress of the user (parents may be any module of the graph)
+    graph = get_curriculum_graph()
+    progress = load_progress_statuses(user, graph)
+
+    # 2. Incoming dependencies (master graph + user's AI overlay)
+    user_graph = user_graph or graph.for_user(user)
+
+    # 3. Units and exercise/attempt counts per unit (master counts come from the graph)
+    unit_by_module = {m.id: graph.unit_id(m.id) for m in modules if m.id in graph}
+    other_ids = [m.id for m in modules if m.id not in graph]
+    if other_ids:
+        unit_by_module.update(Unit.objects.filter(module_id__in=other_ids).values_list('module_id', 'id'))
+    unit_by_module = {module_id: unit_id for module_id, unit_id in unit_by_module.items() if unit_id is not None}
+    unit_ids = list(unit_by_module.values())
+
+    def _counts(queryset, key):
+        return {row[key]: row['total'] for row in queryset.values(key).annotate(total=Count('id'))}
+
+    master_totals = {graph.unit_id(module_id): graph.exercise_count(module_id) for module_id in graph.module_ids}
+    ai_totals = _counts(AIExercise.objects.filter(user=user, source_unit_id__in=unit_ids), 'source_unit_id')
+    completed_attempts = UserExerciseAttempt.objects.filter(user=user, is_completed=True)
+    master_completed = _counts(
+        completed_attempts.filter(master_exercise__unit_id__in=unit_ids), 'master_exercise__unit_id'
+    )
+    ai_completed = _counts(
+        completed_attempts.filter(ai_exercise__source_unit_id__in=unit_ids), 'ai_exercise__source_unit_id'
+    )
+
+    # 4. Walk the graph in memory (same rules as is_module_unlocked)
+    states = {}
+    for module in modules:
+        current = progress.get(module.id)
+        if module.is_ai_generated or current in ['COMPLETED', 'STUCK', 'AVAILABLE']:
+            unlocked = True
+        else:
+            unlocked = all(progress.get(parent_id) == 'COMPLETED' for parent_id in user_graph.parent_ids(module.id))
+
+        status = (current or 'AVAILABLE') if unlocked else 'LOCKED'
+
+        completion = 0.0
+        if status != 'LOCKED':
+            unit_id = unit_by_module.get(module.id)
+            if ai_totals.get(unit_id):
+                total, completed = ai_totals[unit_id], ai_completed.get(unit_id, 0)
+            else:
+                total, completed = master_totals.get(unit_id, 0), master_completed.get(unit_id, 0)
+
+            if unit_id is None or total == 0:
+                # Fallback to status if there are no exercises to count
+                completion = 100.0 if current == 'COMPLETED' else 0.0
+            else:
+                completion = round((completed / total) * 100, 2)
+
+        states[module.id] = {'status': status, 'completion_percentage': completion}
+
+    return states
 
 def update_user_progress(user, module_id, exercises_completed=False, is_stuck=False):
     """
@@ -392,42 +607,182 @@ def update_user_progress(user, module_id, exercises_completed=False, is_stuck=Fa
             progress.status = 'STUCK'
             progress.save()
     elif exercises_completed:
-        progress.status = 'COMPLETED'
-        progress.save()
+        with transaction.atomic():
+            progress.status = 'COMPLETED'
+            progress.save()
+            unlock_child_modules(user, module.id)
+
+    # Invalidate the cached map of the user
+    bump_progress_version(user.id)
+    return progress
+
 
-        # Unlock child modules using ModuleDependency
-        dependencies = ModuleDependency.objects.filter(
-            Q(source_node=module) & (Q(user__isnull=True) | Q(user=user))
+def unlock_child_modules(user, module_id):
+    """
+    Unlocks every child of a completed module whose parents are all COMPLETED.
+    The set is computed in memory from the curriculum graph and a single progress
+    fetch, then written with one bulk insert and one bulk update.
+    Returns the ids of the modules that became available.
+    """
+    graph = get_curriculum_graph()
+    user_graph = graph.for_user(user)
+    children = set(user_graph.child_ids(module_id))
+    if not children:
+        return []
+
+    completed = {
+        progress_module_id for progress_module_id, status in load_progress_statuses(user, graph).items()
+        if status == 'COMPLETED'
+    }
+    # The caller just completed this module (the progress version is bumped afterwards)
+    completed.add(module_id)
+    ready = [
+        child_id for child_id in children
+        if all(parent_id in completed for parent_id in user_graph.parent_ids(child_id))
+    ]
+    if not ready:
+        return []
+
+    with transaction.atomic():
+        # Missing rows are created as AVAILABLE, existing LOCKED rows are unlocked
+        UserModuleProgress.objects.bulk_create(
+            [UserModuleProgress(user=user, module_id=child_id, status='AVAILABLE') for child_id in ready],
+            ignore_conflicts=True
         )
-        for dep in dependencies:
-            target_module = dep.target_node
-            
-            # Check if ALL incoming dependencies of the target module are COMPLETED
-            incoming_to_target = ModuleDependency.objects.filter(
-                Q(target_node=target_module) & (Q(user__isnull=True) | Q(user=user))
+        UserModuleProgress.objects.filter(
+            user=user, module_id__in=ready, status='LOCKED'
+        ).update(status='AVAILABLE', last_updated=timezone.now())
+
+    return ready
+
+
+# Wrong answers after which an exercise is flagged for AI support
+AI_FLAG_THRESHOLD = 3
+
+# Entries kept in UserExerciseAttempt.error_log (the full history lives in AttemptEvent)
+ERROR_LOG_LIMIT = 5
+
+
+def _lock_attempt(user, exercise, is_ai):
+    """
+    Returns the user's attempt row for an exercise, created if needed and locked
+    until the end of the surrounding transaction.
+    """
+    lookup = {'ai_exercise': exercise} if is_ai else {'master_exercise': exercise}
+    attempt, _ = UserExerciseAttempt.objects.select_for_update().get_or_create(user=user, **lookup)
+    return attempt
+
+
+def _record_attempt_event(attempt, exercise, is_ai, answer, is_correct):
+    AttemptEvent.objects.create(
+        attempt=attempt,
+        user_id=attempt.user_id,
+        ai_exercise=exercise if is_ai else None,
+        master_exercise=None if is_ai else exercise,
+        answer=answer,
+        is_correct=is_correct
+    )
+
+
+def _normalize_error_log(error_log):
+    """
+    Rows written before error_log was a ring buffer may hold a single entry (a
+    Pyodide error string, an answer object) instead of a list: it becomes the
+    first entry. Longer legacy lists are trimmed by the caller, their full
+    history is in AttemptEvent (see migration 0012).
+    """
+    if error_log is None or error_log == '':
+        return []
+    if not isinstance(error_log, list):
+        return [error_log]
+    return error_log
+
+
+def record_failed_attempt(user, exercise, is_ai=False, error_entry=None):
+    """
+    Records a wrong answer in one short transaction. The attempt row is locked before
+    it is incremented, so concurrent submissions (double clicks) never lose increments.
+    Returns the updated attempt (attempts_count drives the 3-strike logic).
+    """
+    with transaction.atomic():
+        attempt = _lock_attempt(user, exercise, is_ai)
+        attempt.attempts_count += 1
+        update_fields = ['attempts_count', 'last_attempt_at']
+
+        # Store the answer or the error_log in the attempt's history:
+        # appended to AttemptEvent, only the latest entries are kept on the attempt row
+        _record_attempt_event(attempt, exercise, is_ai, error_entry, is_correct=False)
+        if error_entry is not None:
+            attempt.error_log = _normalize_error_log(attempt.error_log)[-(ERROR_LOG_LIMIT - 1):] + [error_entry]
+            update_fields.append('error_log')
+
+        if attempt.attempts_count >= AI_FLAG_THRESHOLD and not attempt.is_flagged_for_ai:
+            attempt.is_flagged_for_ai = True
+            update_fields.append('is_flagged_for_ai')
+
+        attempt.save(update_fields=update_fields)
+    return attempt
+
+
+def record_exercise_completion(user, exercise, unit, is_ai=False, answer=None):
+    """
+    Marks the user's attempt of an exercise as completed. Only when it flips from not
+    completed to completed the completion counter of the user's module progress is
+    incremented (atomically). Returns True when every exercise of the unit is completed.
+    """
+    with transaction.atomic():
+        # Lock the progress row first so counter initialization and increments are serialized
+        progress, _ = UserModuleProgress.objects.select_for_update().get_or_create(
+            user=user,
+            module_id=unit.module_id,
+            defaults={'status': 'AVAILABLE'}
+        )
+        attempt = _lock_attempt(user, exercise, is_ai)
+        _record_attempt_event(attempt, exercise, is_ai, answer, is_correct=True)
+        flipped = not attempt.is_completed
+        if flipped:
+            attempt.is_completed = True
+            attempt.save(update_fields=['is_completed', 'last_attempt_at'])
+
+        # Counters not initialized yet (e.g. rows created before the counters existed), or
+        # set before master exercises were added to or deleted from the module: recount
+        stale = progress.total_count == 0
+        if not is_ai:
+            graph = get_curriculum_graph()
+            stale = stale or (
+                unit.module_id in graph and progress.total_count != graph.exercise_count(unit.module_id)
             )
-            all_parents_completed = True
-            for incoming_dep in incoming_to_target:
-                if not UserModuleProgress.objects.filter(
-                    user=user, 
-                    module=incoming_dep.source_node, 
-                    status='COMPLETED'
-                ).exists():
-                    all_parents_completed = False
-                    break
-            
-            if all_parents_completed:
-                child_progress, created = UserModuleProgress.objects.get_or_create(
-                    user=user,
-                    module=target_module,
-                    defaults={'status': 'AVAILABLE'}
-                )
-                # If it already existed but was LOCKED, unlock it
-                if not created and child_progress.status == 'LOCKED':
-                    child_progress.status = 'AVAILABLE'
-                    child_progress.save()
-    
-    return progress
+        if not stale and flipped:
+            UserModuleProgress.objects.filter(pk=progress.pk).update(completed_count=F('completed_count') + 1)
+            progress.refresh_from_db(fields=['completed_count'])
+        # The counter still includes completed exercises that were deleted since:
+        # a unit is only reported completed from a fresh count
+        if stale or progress.completed_count >= progress.total_count:
+            _initialize_completion_counters(user, progress, unit, is_ai)
+
+    if flipped:
+        bump_progress_version(user.id)
+    return progress.total_count > 0 and progress.completed_count >= progress.total_count
+
+
+def _initialize_completion_counters(user, progress, unit, is_ai):
+    if is_ai:
+        progress.total_count = AIExercise.objects.filter(source_unit=unit, user=user).count()
+        progress.completed_count = UserExerciseAttempt.objects.filter(
+            user=user, ai_exercise__source_unit=unit, is_completed=True
+        ).count()
+    else:
+        graph = get_curriculum_graph()
+        if unit.module_id in graph:
+            progress.total_count = graph.exercise_count(unit.module_id)
+        else:
+            progress.total_count = MasterExercise.objects.filter(unit=unit).count()
+        progress.completed_count = UserExerciseAttempt.objects.filter(
+            user=user, master_exercise__unit=unit, is_completed=True
+        ).count()
+    UserModuleProgress.objects.filter(pk=progress.pk).update(
+        total_count=progress.total_count, completed_count=progress.completed_count
+    )
 
 
 def generate_ai_lesson(user, module_id):
@@ -440,6 +795,7 @@ def generate_ai_lesson(user, module_id):
     progress, _ = UserModuleProgress.objects.get_or_create(user=user, module=module)
     progress.status = 'STUCK'
     progress.save()
+    bump_progress_version(user.id)
     
     # In a real app, this would generate AIExercises and a Module
     simulated_content = {
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.core.signals import request_started
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Module, UserModuleProgress
+from .models import Module, Unit, MasterExercise, ModuleDependency, UserModuleProgress
+from .versioning import bump_progress_version, bump_curriculum_version, forget_curriculum_version
 
 @receiver(post_save, sender=User)
 def assign_intro_module(sender, instance, created, **kwargs):
@@ -17,3 +19,34 @@ def assign_intro_module(sender, instance, created, **kwargs):
                 module=intro_module,
                 defaults={'status': 'AVAILABLE'}
             )
+            bump_progress_version(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Module)
+@receiver([post_save, post_delete], sender=ModuleDependency)
+def invalidate_curriculum_graph(sender, instance, **kwargs):
+    # Only master rows (user=None) are part of the shared curriculum graph
+    if instance.user_id is None:
+        bump_curriculum_version()
+
+
+@receiver([post_save, post_delete], sender=Unit)
+def invalidate_curriculum_graph_unit(sender, instance, **kwargs):
+    try:
+        is_master = instance.module_id is not None and instance.module.user_id is None
+    except Module.DoesNotExist:
+        # Module already removed by a cascade delete
+        is_master = True
+    if is_master:
+        bump_curriculum_version()
+
+
+@receiver([post_save, post_delete], sender=MasterExercise)
+def invalidate_curriculum_graph_exercise(sender, instance, **kwargs):
+    bump_curriculum_version()
+
+
+@receiver(request_started)
+def refresh_curriculum_version(sender, **kwargs):
+    # Picks up curriculum changes made by other processes (e.g. seed_curriculum)
+    forget_curriculum_version()
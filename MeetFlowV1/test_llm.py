@@ -0,0 +1,192 @@
+import json
+import threading
+import httpx
+import pytest
+from MeetFlowV1 import llm
+from MeetFlowV1.llm import LLMClient, HedgedLLMClient, CircuitBreaker, LLMError, CircuitOpenError, LLMDeadlineError
+
+
+def completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+class TestLLMClient:
+
+    @pytest.fixture(autouse=True)
+    def no_backoff(self, monkeypatch):
+        monkeypatch.setattr(llm.time, "sleep", lambda seconds: None)
+
+    def make_client(self, handler, **kwargs):
+        return LLMClient("http://llm.test/v1/chat/completions", transport=httpx.MockTransport(handler), **kwargs)
+
+    def test_retries_transient_errors(self):
+        responses = [httpx.Response(503), completion("Hello")]
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return responses.pop(0)
+
+        client = self.make_client(handler, model="test-model")
+        assert client.chat([{"role": "user", "content": "Hi"}]) == "Hello"
+        assert len(requests) == 2
+        assert str(requests[0].url) == "http://llm.test/v1/chat/completions"
+
+    def test_client_errors_are_not_retried(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(400, text="bad request")
+
+        with pytest.raises(LLMError):
+            self.make_client(handler, max_retries=3).chat([])
+        assert len(requests) == 1
+
+    def test_breaker_fails_fast_once_open(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            raise httpx.ConnectError("refused")
+
+        breaker = CircuitBreaker(window=10, min_calls=3, failure_rate=0.5, cooldown=60)
+        client = self.make_client(handler, max_retries=0, breaker=breaker)
+        for _ in range(3):
+            with pytest.raises(LLMError):
+                client.chat([])
+
+        assert breaker.is_open
+        with pytest.raises(CircuitOpenError):
+            client.chat([])
+        assert len(requests) == 3
+
+    def test_breaker_closes_after_successful_probe(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(llm.time, "monotonic", lambda: now[0])
+
+        breaker = CircuitBreaker(window=10, min_calls=2, failure_rate=0.5, cooldown=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        now[0] += 31
+        assert breaker.allow()
+        # Only one probe at a time
+        assert not breaker.allow()
+        breaker.record_success()
+        assert not breaker.is_open
+        assert breaker.allow()
+
+    def test_stream_chat_yields_deltas(self):
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, content=(
+                b'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+                b'data: {"choices": [{"delta": {"content": "Keep "}}]}\n\n'
+                b'data: {"choices": [{"delta": {"content": "going!"}}]}\n\n'
+                b'data: [DONE]\n\n'
+            ), headers={"Content-Type": "text/event-stream"})
+
+        client = self.make_client(handler)
+        assert list(client.stream_chat([{"role": "user", "content": "Hi"}])) == ["Keep ", "going!"]
+        assert requests[0]["stream"] is True
+
+
+class TestHedgedLLMClient:
+
+    @pytest.fixture
+    def release(self):
+        event = threading.Event()
+        yield event
+        event.set()
+
+    def upstream(self, name, handler):
+        return LLMClient(f"http://{name}.test/v1", max_retries=0, transport=httpx.MockTransport(handler))
+
+    def stalled(self, release):
+        def handler(request):
+            release.wait(5)
+            return completion("Too late")
+        return handler
+
+    def test_slow_upstream_is_hedged(self, release):
+        client = HedgedLLMClient([
+            self.upstream("slow", self.stalled(release)),
+            self.upstream("fast", lambda request: completion("Hedged")),
+        ], hedge_delay=0.05)
+        assert client.chat([], deadline=2) == "Hedged"
+
+    def test_failed_upstream_fails_over_without_waiting(self):
+        client = HedgedLLMClient([
+            self.upstream("down", lambda request: httpx.Response(503)),
+            self.upstream("up", lambda request: completion("Failover")),
+        ], hedge_delay=60)
+        assert client.chat([]) == "Failover"
+
+    def test_deadline_bounds_the_call(self, release):
+        client = HedgedLLMClient(
+            [self.upstream("a", self.stalled(release)), self.upstream("b", self.stalled(release))],
+            hedge_delay=0.05, deadlines={"feedback": 0.2}
+        )
+        with pytest.raises(LLMDeadlineError):
+            client.chat([], call_site="feedback")
+
+
+class TestMockLLMServer:
+
+    @pytest.fixture
+    def server(self):
+        from MeetFlowV1.mock_llm import start_mock_llm_server
+
+        server = start_mock_llm_server(latency=0)
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def test_serves_reinforcement_and_feedback(self, server):
+        client = LLMClient(server.base_url)
+        reinforcement = json.loads(client.chat([{"role": "user", "content": 'Respond with {"module_title": ...}'}]))
+        assert len(reinforcement["exercises"]) == 3
+
+        streamed = "".join(client.stream_chat([{"role": "user", "content": "Give feedback"}]))
+        assert streamed == client.chat([{"role": "user", "content": "Give feedback"}])
+        assert server.requests == 3
+
+    def test_failure_rate(self, server):
+        server.failure_rate = 1.0
+        with pytest.raises(LLMError):
+            LLMClient(server.base_url, max_retries=0).chat([{"role": "user", "content": "Hi"}])
+
+
+class TestLLMMetrics:
+
+    def test_calls_are_recorded_with_usage_and_outcome(self, client, settings, monkeypatch):
+        monkeypatch.setattr(llm.time, "sleep", lambda seconds: None)
+        responses = [
+            httpx.Response(503),
+            httpx.Response(200, json={
+                "choices": [{"message": {"content": "Hello"}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 3}
+            }),
+            httpx.Response(400),
+        ]
+        llm_client = LLMClient(
+            "http://llm.test/v1", model="test-model", transport=httpx.MockTransport(lambda request: responses.pop(0))
+        )
+        llm_client.chat([], call_site="feedback")
+        with pytest.raises(LLMError):
+            llm_client.chat([], call_site="reinforcement")
+
+        settings.METRICS_TOKEN = "secret"
+        assert client.get("/api/metrics/").status_code == 403
+        metrics = client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer secret").content.decode()
+
+        assert 'llm_request_duration_seconds_count{call_site="feedback",model="test-model",outcome="success"} 1' in metrics
+        assert 'llm_request_duration_seconds_bucket{call_site="feedback",model="test-model",outcome="success",le="+Inf"} 1' in metrics
+        assert 'llm_request_duration_seconds_count{call_site="reinforcement",model="test-model",outcome="http_error"} 1' in metrics
+        assert 'llm_prompt_tokens_total{call_site="feedback",model="test-model"} 12' in metrics
+        assert 'llm_completion_tokens_total{call_site="feedback",model="test-model"} 3' in metrics
+        assert 'llm_retries_total{call_site="feedback",model="test-model"} 1' in metrics
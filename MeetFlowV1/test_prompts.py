@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from MeetFlowV1.prompts import (
+    build_feedback_messages,
+    build_reinforcement_messages,
+    compact_errors,
+    estimate_tokens,
+)
+
+
+def test_feedback_prompt_keeps_only_useful_content():
+    exercise = SimpleNamespace(type='BLANKS', content={
+        "code_template": "{{input}}('Hello')" * 50,
+        "options": ["print", "show"],
+        "instruction": "Complete the code.",
+        "ai_focus": "basic print function syntax",
+    })
+    prompt = build_feedback_messages(exercise, ["show"])[0]["content"]
+
+    assert "basic print function syntax" in prompt
+    assert "code_template" not in prompt
+
+
+def test_errors_are_deduplicated_and_most_recent_first_kept():
+    errors = ["NameError: x", "  nameerror:   X ", "IndexError", "TypeError", "KeyError"]
+    assert compact_errors(errors, 3) == ["IndexError", "TypeError", "KeyError"]
+    assert compact_errors(["a", "b", "A"], 5) == ["b", "A"]
+
+
+def test_prompts_respect_the_token_budget(settings):
+    settings.LLM_PROMPT_BUDGET_REINFORCEMENT = 700
+    pasted_programs = [f"def solve_{idx}():\n" + "    x = compute()\n" * 400 for idx in range(5)]
+
+    messages = build_reinforcement_messages("Loops", "CODE", pasted_programs)
+    prompt = messages[1]["content"]
+
+    assert estimate_tokens(prompt) <= 700
+    # The most recent error survives, shortened
+    assert "def solve_4():" in prompt
+    assert '"module_title": "Theoretical Reinforcement: Loops"' in prompt
+
+
+def test_oversized_exercise_content_is_shortened_to_the_budget(settings, caplog):
+    settings.LLM_PROMPT_BUDGET_FEEDBACK = 200
+    exercise = SimpleNamespace(type='THEORY', content={
+        "question": "Which statement is true? " + "A very long scenario. " * 200,
+        "instruction": "Pick one.",
+    })
+
+    prompt = build_feedback_messages(exercise, ["b", "c"])[0]["content"]
+
+    assert estimate_tokens(prompt) <= 200
+    assert "Which statement is true?" in prompt
+    assert "Recent errors: ['b', 'c']" in prompt
+
+    # A budget the template alone exceeds cannot be met: it is reported
+    settings.LLM_PROMPT_BUDGET_FEEDBACK = 10
+    build_feedback_messages(exercise, ["b"])
+    assert "Prompt over budget" in caplog.text
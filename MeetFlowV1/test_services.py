@@ -186,3 +186,452 @@ class TestServices:
         # Check if they belong to a unit named "Theoretical Review"
         ai_unit = UnitModel.objects.get(module=new_module)
         assert ai_unit.title == "Theoretical Review"
+
+    def test_resolve_module_states(self, user, module, unit, exercise):
+        from MeetFlowV1.models import ModuleDependency, UserExerciseAttempt
+        from MeetFlowV1.services import resolve_module_states
+
+        next_module = Module.objects.create(title="Next Module", order=2)
+        ModuleDependency.objects.create(source_node=module, target_node=next_module)
+
+        states = resolve_module_states(user, [module, next_module])
+        assert states[module.id] == {'status': 'AVAILABLE', 'completion_percentage': 0.0}
+        assert states[next_module.id] == {'status': 'LOCKED', 'completion_percentage': 0.0}
+
+        UserExerciseAttempt.objects.create(user=user, master_exercise=exercise, is_completed=True)
+        update_user_progress(user, module.id, exercises_completed=True)
+
+        states = resolve_module_states(user, [module, next_module])
+        assert states[module.id] == {'status': 'COMPLETED', 'completion_percentage': 100.0}
+        # No unit: completion falls back to the status
+        assert states[next_module.id] == {'status': 'AVAILABLE', 'completion_percentage': 0.0}
+
+    def test_resolve_module_states_query_count_is_constant(self, user, module, django_assert_num_queries):
+        from MeetFlowV1.models import ModuleDependency
+        from MeetFlowV1.services import resolve_module_states
+        from MeetFlowV1.graph import get_curriculum_graph
+
+        previous = module
+        for idx in range(10):
+            current = Module.objects.create(title=f"Module {idx}", order=idx + 2)
+            Unit.objects.create(module=current, title=f"Unit {idx}", order=1)
+            ModuleDependency.objects.create(source_node=previous, target_node=current)
+            previous = current
+
+        modules = list(Module.objects.all())
+        # Warm the shared curriculum graph: master dependencies and counts come from it
+        get_curriculum_graph()
+        with django_assert_num_queries(5):
+            states = resolve_module_states(user, modules)
+
+        assert len(states) == 11
+        assert states[module.id]['status'] == 'AVAILABLE'
+
+    def test_curriculum_graph_is_built_once_per_version(self, user, module, unit, exercise, django_assert_num_queries):
+        from MeetFlowV1.models import ModuleDependency
+        from MeetFlowV1.graph import get_curriculum_graph
+
+        second = Module.objects.create(title="Second", order=3)
+        third = Module.objects.create(title="Third", order=2)
+        ModuleDependency.objects.create(source_node=second, target_node=third)
+        ModuleDependency.objects.create(source_node=module, target_node=second)
+
+        graph = get_curriculum_graph()
+        assert graph.module_ids == (module.id, second.id, third.id)
+        assert graph.parent_ids(third.id) == [second.id]
+        assert graph.child_ids(module.id) == [second.id]
+        assert graph.unit_id(module.id) == unit.id
+        assert graph.exercise_count(module.id) == 1
+
+        with django_assert_num_queries(0):
+            assert get_curriculum_graph() is graph
+
+        # Writing a master row invalidates the graph
+        fourth = Module.objects.create(title="Fourth", order=4)
+        assert fourth.id in get_curriculum_graph()
+
+    def test_curriculum_graph_follows_changes_made_by_other_processes(self, module):
+        from django.core.signals import request_started
+        from django.db.models import F
+        from MeetFlowV1.graph import get_curriculum_graph
+        from MeetFlowV1.models import VersionCounter
+        from MeetFlowV1.versioning import CURRICULUM_VERSION_KEY
+
+        graph = get_curriculum_graph()
+
+        # seed_curriculum in another process: no signals here, only the shared counter moves
+        Module.objects.bulk_create([Module(title="Seeded", order=2)])
+        VersionCounter.objects.filter(key=CURRICULUM_VERSION_KEY).update(value=F('value') + 1)
+        assert get_curriculum_graph() is graph
+
+        request_started.send(sender=None)
+        seeded = Module.objects.get(title="Seeded")
+        assert seeded.id in get_curriculum_graph()
+
+    def test_curriculum_graph_user_overlay(self, user, module):
+        from MeetFlowV1.models import ModuleDependency
+        from MeetFlowV1.graph import get_curriculum_graph
+
+        next_module = Module.objects.create(title="Next Module", order=2)
+        ModuleDependency.objects.create(source_node=module, target_node=next_module)
+        ai_module = Module.objects.create(title="AI", user=user, is_ai_generated=True, source_module=module)
+        ModuleDependency.objects.create(source_node=ai_module, target_node=next_module, user=user)
+
+        user_graph = get_curriculum_graph().for_user(user)
+        assert user_graph.parent_ids(next_module.id) == [module.id, ai_module.id]
+        assert user_graph.child_ids(ai_module.id) == [next_module.id]
+
+    def test_all_parents_completed_single_query(self, user, module, django_assert_num_queries):
+        from MeetFlowV1.models import ModuleDependency
+        from MeetFlowV1.services import all_parents_completed
+
+        next_module = Module.objects.create(title="Next Module", order=2)
+        ModuleDependency.objects.create(source_node=module, target_node=next_module)
+        ai_module = Module.objects.create(title="AI", user=user, is_ai_generated=True, source_module=module)
+        ModuleDependency.objects.create(source_node=ai_module, target_node=next_module, user=user)
+
+        with django_assert_num_queries(1):
+            assert all_parents_completed(user, next_module.id) is False
+        assert all_parents_completed(user, module.id) is True
+
+        UserModuleProgress.objects.create(user=user, module=module, status='COMPLETED')
+        assert all_parents_completed(user, next_module.id) is False
+
+        UserModuleProgress.objects.create(user=user, module=ai_module, status='COMPLETED')
+        assert all_parents_completed(user, next_module.id) is True
+
+    def test_unlock_child_modules_is_set_based(self, user, module, django_assert_num_queries):
+        from MeetFlowV1.models import ModuleDependency
+        from MeetFlowV1.services import unlock_child_modules
+        from MeetFlowV1.graph import get_curriculum_graph
+
+        other_parent = Module.objects.create(title="Other Parent", order=2)
+        children = [Module.objects.create(title=f"Child {idx}", order=idx + 3) for idx in range(8)]
+        for child in children:
+            ModuleDependency.objects.create(source_node=module, target_node=child)
+        # The last child also needs another parent that is not completed
+        ModuleDependency.objects.create(source_node=other_parent, target_node=children[-1])
+        UserModuleProgress.objects.create(user=user, module=children[0], status='LOCKED')
+        UserModuleProgress.objects.create(user=user, module=module, status='COMPLETED')
+
+        get_curriculum_graph()
+        # Overlay + progress fetch + bulk insert + bulk update (+ savepoint)
+        with django_assert_num_queries(6):
+            unlocked = unlock_child_modules(user, module.id)
+
+        assert set(unlocked) == {child.id for child in children[:-1]}
+        assert UserModuleProgress.objects.filter(user=user, module__in=children[:-1], status='AVAILABLE').count() == 7
+        assert not UserModuleProgress.objects.filter(user=user, module=children[-1]).exists()
+
+    def test_progress_bitmap_round_trip(self, user, module, settings, django_assert_num_queries):
+        from MeetFlowV1.models import ModuleDependency, UserProgressBitmap
+        from MeetFlowV1.services import load_progress_statuses, resolve_module_states
+        from MeetFlowV1.graph import get_curriculum_graph
+
+        settings.PROGRESS_BITMAP_ENABLED = True
+        next_module = Module.objects.create(title="Next Module", order=2)
+        ModuleDependency.objects.create(source_node=module, target_node=next_module)
+        ai_module = Module.objects.create(title="AI", user=user, is_ai_generated=True, source_module=module)
+        UserModuleProgress.objects.create(user=user, module=ai_module, status='AVAILABLE')
+        update_user_progress(user, module.id, exercises_completed=True)
+
+        expected = {module.id: 'COMPLETED', next_module.id: 'AVAILABLE', ai_module.id: 'AVAILABLE'}
+        graph = get_curriculum_graph()
+        assert load_progress_statuses(user, graph) == expected
+
+        bitmap = UserProgressBitmap.objects.get(user=user)
+        assert bitmap.curriculum == graph.fingerprint
+        assert bitmap.overlay == {str(ai_module.id): 'AVAILABLE'}
+
+        # Up to date: the progress version and a single row
+        with django_assert_num_queries(2):
+            assert load_progress_statuses(user, graph) == expected
+
+        # Any progress write makes it stale
+        update_user_progress(user, next_module.id, is_stuck=True)
+        states = resolve_module_states(user, [module, next_module, ai_module])
+        assert states[next_module.id]['status'] == 'STUCK'
+
+    def test_progress_bitmap_is_rebuilt_when_the_curriculum_is_reseeded(self, user, module, settings):
+        from MeetFlowV1.services import load_progress_statuses
+        from MeetFlowV1.graph import get_curriculum_graph
+        from MeetFlowV1.versioning import bump_curriculum_version
+
+        settings.PROGRESS_BITMAP_ENABLED = True
+        update_user_progress(user, module.id, exercises_completed=True)
+        graph = get_curriculum_graph()
+        assert load_progress_statuses(user, graph) == {module.id: 'COMPLETED'}
+
+        # seed_curriculum with the same JSON: progress rows wiped, same fingerprint, same progress version
+        UserModuleProgress.objects.filter(user=user).delete()
+        bump_curriculum_version()
+        reseeded = get_curriculum_graph()
+        assert reseeded.fingerprint == graph.fingerprint
+        assert load_progress_statuses(user, reseeded) == {}
+
+    def test_record_exercise_completion_counts_each_exercise_once(self, user, module, unit, exercise):
+        from MeetFlowV1.models import UserExerciseAttempt
+        from MeetFlowV1.services import record_exercise_completion
+
+        second = MasterExercise.objects.create(
+            unit=unit, type='THEORY', order=2,
+            content={"question": "1+1?"}, solution={"expected": "b"}
+        )
+        UserExerciseAttempt.objects.create(user=user, master_exercise=exercise, attempts_count=2)
+
+        assert record_exercise_completion(user, exercise, unit) is False
+        # Answering the same exercise correctly again does not count twice
+        assert record_exercise_completion(user, exercise, unit) is False
+
+        progress = UserModuleProgress.objects.get(user=user, module=module)
+        assert (progress.completed_count, progress.total_count) == (1, 2)
+
+        assert record_exercise_completion(user, second, unit) is True
+        progress.refresh_from_db()
+        assert progress.completed_count == 2
+        assert UserExerciseAttempt.objects.filter(user=user, is_completed=True).count() == 2
+
+    def test_completion_counters_follow_curriculum_changes(self, user, module, unit, exercise):
+        from MeetFlowV1.services import record_exercise_completion
+
+        second, third = [
+            MasterExercise.objects.create(
+                unit=unit, type='THEORY', order=order, content={"question": "1+1?"}, solution={"expected": "b"}
+            )
+            for order in (2, 3)
+        ]
+        assert record_exercise_completion(user, exercise, unit) is False
+        assert UserModuleProgress.objects.get(user=user, module=module).total_count == 3
+
+        third.delete()
+        assert record_exercise_completion(user, second, unit) is True
+        progress = UserModuleProgress.objects.get(user=user, module=module)
+        assert (progress.completed_count, progress.total_count) == (2, 2)
+
+        # A new exercise has to be completed too, and the completed one it replaced no longer counts
+        fourth = MasterExercise.objects.create(
+            unit=unit, type='THEORY', order=4, content={"question": "2+2?"}, solution={"expected": "a"}
+        )
+        second.delete()
+        assert record_exercise_completion(user, exercise, unit) is False
+        progress.refresh_from_db()
+        assert (progress.completed_count, progress.total_count) == (1, 2)
+        assert record_exercise_completion(user, fourth, unit) is True
+
+    def test_record_failed_attempt(self, user, exercise):
+        from MeetFlowV1.services import record_failed_attempt
+
+        for idx in range(3):
+            attempt = record_failed_attempt(user, exercise, error_entry=f"error {idx}")
+            assert attempt.attempts_count == idx + 1
+            assert attempt.is_flagged_for_ai is (idx == 2)
+
+        attempt.refresh_from_db()
+        assert attempt.attempts_count == 3
+        assert attempt.error_log == ["error 0", "error 1", "error 2"]
+        assert attempt.is_flagged_for_ai is True
+
+    def test_error_log_is_a_capped_ring_buffer(self, user, exercise):
+        from MeetFlowV1.models import AttemptEvent
+        from MeetFlowV1.services import record_failed_attempt, record_exercise_completion, ERROR_LOG_LIMIT
+
+        for idx in range(ERROR_LOG_LIMIT + 3):
+            attempt = record_failed_attempt(user, exercise, error_entry=f"error {idx}")
+        record_exercise_completion(user, exercise, exercise.unit, answer="42")
+
+        attempt.refresh_from_db()
+        assert attempt.error_log == [f"error {idx}" for idx in range(3, ERROR_LOG_LIMIT + 3)]
+
+        events = AttemptEvent.objects.filter(attempt=attempt).order_by('id')
+        assert events.count() == ERROR_LOG_LIMIT + 4
+        assert [event.answer for event in events][:2] == ["error 0", "error 1"]
+        assert events.last().is_correct is True
+
+    def test_legacy_error_logs_are_normalized_into_the_ring_buffer(self, user, exercise):
+        from MeetFlowV1.models import UserExerciseAttempt
+        from MeetFlowV1.services import record_failed_attempt, ERROR_LOG_LIMIT
+
+        # Written before the ring buffer: a bare Pyodide error instead of a list
+        UserExerciseAttempt.objects.create(user=user, master_exercise=exercise, error_log="NameError: x")
+        attempt = record_failed_attempt(user, exercise, error_entry="error 1")
+        attempt.refresh_from_db()
+        assert attempt.error_log == ["NameError: x", "error 1"]
+
+        # An oversized legacy list keeps its latest entries
+        UserExerciseAttempt.objects.filter(id=attempt.id).update(error_log=[{"answer": idx} for idx in range(8)])
+        attempt = record_failed_attempt(user, exercise, error_entry="error 2")
+        attempt.refresh_from_db()
+        assert len(attempt.error_log) == ERROR_LOG_LIMIT
+        assert attempt.error_log == [{"answer": idx} for idx in range(4, 8)] + ["error 2"]
+
+    def test_reinforcement_cache_is_shared_across_users(self, user, module, monkeypatch):
+        import json
+        from MeetFlowV1.models import ReinforcementCacheEntry, AIExercise
+        from MeetFlowV1.services import AIService
+
+        calls = []
+        mock_json = {
+            "module_title": "Theoretical Reinforcement: Test Module",
+            "exercises": [{"type": "THEORY", "content": {"question": "Q1"}, "solution": {"expected": "a"}}]
+        }
+        monkeypatch.setattr(AIService, "_call_llm", lambda *args, **kwargs: calls.append(1) or json.dumps(mock_json))
+
+        AIService.inject_reinforcement_module(user, module, "CODE", ["NameError: x", "SyntaxError"])
+        other = User.objects.create_user(username="other", password="password")
+        # Same errors up to case, whitespace and order: served from the cache
+        cached_module = AIService.inject_reinforcement_module(other, module, "CODE", ["syntaxerror ", "nameerror:  x"])
+
+        assert len(calls) == 1
+        assert cached_module.title == "Theoretical Reinforcement: Test Module"
+        assert AIExercise.objects.filter(user=other, source_unit__module=cached_module).count() == 1
+        assert ReinforcementCacheEntry.objects.get().hits == 1
+
+        third = User.objects.create_user(username="third", password="password")
+        AIService.inject_reinforcement_module(third, module, "CODE", ["IndexError"])
+        assert len(calls) == 2
+
+    def test_reinforcement_cache_evicts_least_recently_used(self, module):
+        from datetime import timedelta
+        from django.utils import timezone
+        from MeetFlowV1.models import ReinforcementCacheEntry
+        from MeetFlowV1.reinforcement_cache import evict_reinforcement_cache
+
+        now = timezone.now()
+        for idx in range(3):
+            ReinforcementCacheEntry.objects.create(
+                source_module=module, exercise_type="CODE", error_signature=str(idx), curriculum="v1",
+                module_title="Reinforcement", last_used_at=now - timedelta(minutes=idx)
+            )
+
+        assert evict_reinforcement_cache(max_entries=2) == 1
+        assert sorted(ReinforcementCacheEntry.objects.values_list('error_signature', flat=True)) == ['0', '1']
+
+    def test_reinforcement_bank_is_used_before_the_llm(self, user, module, exercise, monkeypatch):
+        import json
+        from django.core.management import call_command
+        from MeetFlowV1.models import ReinforcementBankEntry
+        from MeetFlowV1.services import AIService
+
+        calls = []
+        mock_json = {
+            "module_title": "Theoretical Reinforcement: Test Module",
+            "exercises": [{"type": "THEORY", "content": {"question": "Q1"}, "solution": {"expected": "a"}}]
+        }
+        monkeypatch.setattr(AIService, "_call_llm", lambda *args, **kwargs: calls.append(1) or json.dumps(mock_json))
+
+        call_command('build_reinforcement_bank', '--concurrency', '2')
+        call_command('build_reinforcement_bank')
+        assert len(calls) == 1
+        entry = ReinforcementBankEntry.objects.get()
+        assert (entry.source_module_id, entry.exercise_type) == (module.id, exercise.type)
+
+        new_module = AIService.inject_reinforcement_module(user, module, exercise.type, ["error"])
+        assert new_module.title == "Theoretical Reinforcement: Test Module"
+        assert len(calls) == 1
+
+    def test_reinforcement_module_is_created_once(self, user, module):
+        from MeetFlowV1.graph import get_curriculum_graph
+        from MeetFlowV1.services import AIService
+
+        data = {
+            "module_title": "Theoretical Reinforcement: Test Module",
+            "exercises": [{"type": "THEORY", "content": {"question": "Q1"}, "solution": {"expected": "a"}}]
+        }
+        graph = get_curriculum_graph()
+        # Both callers passed the limit checks before either one wrote its module
+        first = AIService.create_reinforcement_module(user, module, "CODE", data, graph)
+        second = AIService.create_reinforcement_module(user, module, "CODE", data, graph)
+
+        assert first == second
+        assert Module.objects.filter(user=user, source_module=module, is_ai_generated=True).count() == 1
+
+    def test_reinforcement_module_is_written_in_a_fixed_number_of_queries(self, user, module, django_assert_num_queries):
+        from MeetFlowV1.models import ModuleDependency, AIExercise
+        from MeetFlowV1.graph import get_curriculum_graph
+        from MeetFlowV1.services import AIService
+
+        for idx in range(3):
+            ModuleDependency.objects.create(source_node=module, target_node=Module.objects.create(title=f"Next {idx}", order=2))
+        data = {
+            "module_title": "Theoretical Reinforcement: Test Module",
+            "exercises": [
+                {"type": "THEORY", "content": {"question": f"Q{idx}"}, "solution": {"expected": "a"}}
+                for idx in range(3)
+            ]
+        }
+        graph = get_curriculum_graph()
+
+        # Savepoints, module, unit, exercises, progress, edges and the progress version
+        with django_assert_num_queries(10):
+            new_module = AIService.create_reinforcement_module(user, module, "CODE", data, graph)
+
+        assert AIExercise.objects.filter(source_unit__module=new_module).count() == 3
+        assert ModuleDependency.objects.filter(user=user, source_node=new_module, bypassed_source=module).count() == 3
+
+    @pytest.fixture
+    def theory_exercise(self, unit):
+        return MasterExercise.objects.create(
+            unit=unit, type='THEORY', order=2,
+            content={"question": "What prints text?", "options": {"a": "print", "b": "echo", "c": "show"}},
+            solution={"expected": "a", "explanation": "print() writes to the console"}
+        )
+
+    def test_feedback_hint_is_shared_for_the_same_wrong_answers(self, theory_exercise, exercise, monkeypatch):
+        from django.core.cache import cache
+        from MeetFlowV1.models import FeedbackHintEntry
+        from MeetFlowV1.services import AIService
+
+        calls = []
+        monkeypatch.setattr(AIService, "_call_llm", lambda *args, **kwargs: calls.append(1) or "Think about output.")
+
+        assert AIService.get_adaptive_feedback(theory_exercise, ["b", "c", "b"]) == "Think about output."
+        # Same answers up to case, whitespace, order and repetitions
+        assert AIService.get_adaptive_feedback(theory_exercise, ["C ", "B"]) == "Think about output."
+        cache.clear()
+        assert AIService.get_adaptive_feedback(theory_exercise, ["c", "b"]) == "Think about output."
+        assert len(calls) == 1
+        assert FeedbackHintEntry.objects.get().hits == 1
+
+        AIService.get_adaptive_feedback(theory_exercise, ["c"])
+        # Free-form CODE answers are never stored
+        AIService.get_adaptive_feedback(exercise, ["print(41)"])
+        AIService.get_adaptive_feedback(exercise, ["print(41)"])
+        assert len(calls) == 4
+        assert FeedbackHintEntry.objects.count() == 2
+
+    def test_feedback_hints_expire_and_evict(self, theory_exercise, settings):
+        from datetime import timedelta
+        from django.core.cache import cache
+        from django.utils import timezone
+        from MeetFlowV1.feedback_hints import get_feedback_hint, store_feedback_hint, evict_feedback_hints
+        from MeetFlowV1.models import FeedbackHintEntry
+
+        for answer in ("b", "c"):
+            store_feedback_hint(theory_exercise, [answer], f"Hint for {answer}")
+        FeedbackHintEntry.objects.filter(hint="Hint for b").update(
+            created_at=timezone.now() - timedelta(days=settings.FEEDBACK_HINT_TTL_DAYS + 1)
+        )
+        cache.clear()
+        assert get_feedback_hint(theory_exercise, ["b"]) is None
+        assert get_feedback_hint(theory_exercise, ["c"]) == "Hint for c"
+
+        assert evict_feedback_hints(max_entries=1) == 1
+        assert FeedbackHintEntry.objects.get().hint == "Hint for c"
+
+    def test_feedback_hints_are_pre_generated(self, theory_exercise, exercise, monkeypatch):
+        from django.core.management import call_command
+        from MeetFlowV1.models import FeedbackHintEntry
+        from MeetFlowV1.services import AIService
+
+        prompts = []
+        monkeypatch.setattr(
+            AIService, "_call_llm", lambda messages, **kwargs: prompts.append(messages[0]["content"]) or "Pre-generated"
+        )
+
+        call_command('build_feedback_hints', '--concurrency', '2')
+        call_command('build_feedback_hints')
+        # One hint per wrong option, none for the CODE exercise
+        assert len(prompts) == 2
+        assert FeedbackHintEntry.objects.filter(exercise=theory_exercise).count() == 2
+        assert AIService.get_adaptive_feedback(theory_exercise, ["c", "c", "c"]) == "Pre-generated"
+        assert len(prompts) == 2
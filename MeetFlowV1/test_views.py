@@ -0,0 +1,461 @@
+import pytest
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+from MeetFlowV1.models import Module, Unit, MasterExercise, ModuleDependency, UserModuleProgress
+from MeetFlowV1.services import update_user_progress
+
+
+@pytest.mark.django_db
+class TestMapProgressView:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username="mapuser", password="password")
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    @pytest.fixture
+    def modules(self):
+        first = Module.objects.create(title="First", order=1, position_x=100.0, position_y=100.0)
+        second = Module.objects.create(title="Second", order=2, position_x=300.0, position_y=100.0)
+        ModuleDependency.objects.create(source_node=first, target_node=second)
+        unit = Unit.objects.create(module=first, title="First Unit", order=1)
+        MasterExercise.objects.create(
+            unit=unit, type='THEORY', order=1,
+            content={"question": "1+1?", "options": {"a": "1", "b": "2"}},
+            solution={"expected": "b"}
+        )
+        return first, second
+
+    def _statuses(self, response):
+        return {node['data']['db_id']: node['data']['status'] for node in response.data['nodes']}
+
+    def test_map_returns_nodes_and_edges(self, client, modules):
+        first, second = modules
+        response = client.get('/api/map/')
+
+        assert response.status_code == 200
+        assert self._statuses(response) == {first.id: 'AVAILABLE', second.id: 'LOCKED'}
+        assert [edge['id'] for edge in response.data['edges']] == [f"e{first.id}-{second.id}"]
+
+    def test_map_snapshot_is_reused_until_progress_changes(self, client, user, modules, django_assert_num_queries):
+        first, second = modules
+        client.get('/api/map/')
+
+        # Cached snapshot: only the progress version is read
+        with django_assert_num_queries(1):
+            client.get('/api/map/')
+
+        update_user_progress(user, first.id, exercises_completed=True)
+        response = client.get('/api/map/')
+        assert self._statuses(response) == {first.id: 'COMPLETED', second.id: 'AVAILABLE'}
+
+    def test_map_answers_304_for_matching_etag(self, client, user, modules, django_assert_num_queries):
+        first, _ = modules
+        response = client.get('/api/map/')
+        etag = response['ETag']
+        assert etag == f'"{response.data["version"]}"'
+
+        # Progress version only
+        with django_assert_num_queries(1):
+            response = client.get('/api/map/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        update_user_progress(user, first.id, exercises_completed=True)
+        response = client.get('/api/map/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_map_is_rebuilt_after_a_bump_from_another_process(self, client, user, modules):
+        first, second = modules
+        etag = client.get('/api/map/')['ETag']
+
+        # The reinforcement worker runs in its own process, with its own cache
+        worker_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'}}
+        with override_settings(CACHES=worker_cache):
+            update_user_progress(user, first.id, exercises_completed=True)
+
+        response = client.get('/api/map/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert self._statuses(response) == {first.id: 'COMPLETED', second.id: 'AVAILABLE'}
+
+    def test_map_since_returns_only_changes(self, client, user, modules):
+        first, second = modules
+        version = client.get('/api/map/').data['version']
+
+        update_user_progress(user, first.id, exercises_completed=True)
+        response = client.get('/api/map/', {'since': version})
+
+        assert response.data['since'] == version
+        assert self._statuses(response) == {first.id: 'COMPLETED', second.id: 'AVAILABLE'}
+        assert response.data['edges'] == []
+        assert response.data['removed_nodes'] == []
+
+        # Unknown versions fall back to the full payload
+        response = client.get('/api/map/', {'since': 'unknown'})
+        assert 'since' not in response.data
+        assert len(response.data['nodes']) == 2
+
+    def test_map_since_ignores_malformed_versions(self, client, modules, monkeypatch):
+        from MeetFlowV1 import views
+
+        looked_up = []
+        original = views.get_map_snapshot
+        monkeypatch.setattr(
+            views, "get_map_snapshot", lambda user_id, version: looked_up.append(version) or original(user_id, version)
+        )
+        version = client.get('/api/map/').data['version']
+
+        # Would be invalid memcached keys (spaces, control characters, over 250 characters)
+        for since in ('1 2', '1-2\n', 'x' * 300, f'{version}\x00'):
+            response = client.get('/api/map/', {'since': since})
+            assert response.status_code == 200
+            assert 'since' not in response.data
+            assert len(response.data['nodes']) == 2
+        # Only the current snapshot is ever looked up: the malformed values never reach the cache
+        assert looked_up == [version] * 5
+
+    def test_map_uses_layout_stored_at_injection(self, client, user, modules, monkeypatch, django_assert_max_num_queries):
+        import json
+        from MeetFlowV1.services import AIService
+
+        first, second = modules
+        mock_json = {
+            "module_title": "Theoretical Reinforcement: First",
+            "exercises": [
+                {"type": "THEORY", "content": {"question": "Q1"}, "solution": {"expected": "a"}}
+            ]
+        }
+        monkeypatch.setattr(AIService, "_call_llm", lambda *args, **kwargs: json.dumps(mock_json))
+        ai_module = AIService.inject_reinforcement_module(user, first, "PARSONS", ["error"])
+
+        assert ai_module.display_id == f"{first.id}.2"
+        assert (ai_module.position_x, ai_module.position_y) == (200.0, 80.0)
+
+        with django_assert_max_num_queries(10):
+            response = client.get('/api/map/')
+
+        ai_node = next(node for node in response.data['nodes'] if node['data']['db_id'] == ai_module.id)
+        assert ai_node['id'] == f"{first.id}.2"
+        assert ai_node['position'] == {'x': 200.0, 'y': 80.0}
+
+        edges = {edge['id']: edge['label'] for edge in response.data['edges']}
+        # The direct master edge is bypassed by the AI module
+        assert edges == {
+            f"e{first.id}-{first.id}.2": "Reinforcement: PARSONS",
+            f"e{first.id}.2-{second.id}": "AI Reinforcement",
+        }
+
+
+@pytest.mark.django_db
+class TestExerciseCheckView:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username="checkuser", password="password")
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    @pytest.fixture
+    def unit(self):
+        module = Module.objects.create(title="Theory", order=1)
+        return Unit.objects.create(module=module, title="Theory Unit", order=1)
+
+    @pytest.fixture
+    def exercises(self, unit):
+        return [
+            MasterExercise.objects.create(
+                unit=unit, type='THEORY', order=idx,
+                content={"question": f"Q{idx}", "options": {"a": "1", "b": "2"}},
+                solution={"expected": "b", "explanation": "Two"}
+            )
+            for idx in range(2)
+        ]
+
+    def test_correct_answers_complete_the_module(self, client, user, unit, exercises):
+        first, second = exercises
+
+        response = client.post(f'/api/exercises/{first.id}/check/', {'answer': 'b'}, format='json')
+        assert response.data['correct'] is True
+        assert UserModuleProgress.objects.get(user=user, module=unit.module).status == 'AVAILABLE'
+
+        client.post(f'/api/exercises/{second.id}/check/', {'answer': 'b'}, format='json')
+        progress = UserModuleProgress.objects.get(user=user, module=unit.module)
+        assert progress.status == 'COMPLETED'
+        assert (progress.completed_count, progress.total_count) == (2, 2)
+
+    def test_legacy_submit_records_the_wrong_answer(self, client, user, exercises):
+        from MeetFlowV1.models import AttemptEvent, UserExerciseAttempt
+
+        response = client.post(f'/api/exercise/{exercises[0].id}/submit/', {'response': 'a'}, format='json')
+        assert response.data['correct'] is False
+        assert UserExerciseAttempt.objects.get(user=user, master_exercise=exercises[0]).error_log == ['a']
+        assert AttemptEvent.objects.get(user=user).answer == 'a'
+
+    @pytest.fixture(autouse=True)
+    def no_batch_window(self, settings):
+        settings.AI_BATCH_WINDOW = 0
+
+    MOCK_REINFORCEMENT = {
+        "module_title": "Theoretical Reinforcement: Theory",
+        "exercises": [{"type": "THEORY", "content": {"question": "Q1"}, "solution": {"expected": "a"}}]
+    }
+
+    def test_third_wrong_answer_queues_ai_job(self, client, user, unit, exercises, monkeypatch):
+        from MeetFlowV1.services import AIService
+        from MeetFlowV1.jobs import run_next_job
+
+        generated = []
+        monkeypatch.setattr(AIService, "get_adaptive_feedback", lambda exercise, error_log, **kwargs: "Keep going!")
+        monkeypatch.setattr(
+            AIService, "_generate_reinforcement_content",
+            lambda module, exercise_type, error_log: generated.append(list(error_log)) or self.MOCK_REINFORCEMENT
+        )
+
+        for answer in ['a', 'c', 'd']:
+            response = client.post(f'/api/exercises/{exercises[0].id}/check/', {'answer': answer}, format='json')
+
+        assert response.data['correct'] is False
+        assert response.data['flagged_for_ai'] is True
+        assert UserModuleProgress.objects.get(user=user, module=unit.module).status == 'STUCK'
+        # The request itself does not call the LLM
+        assert generated == []
+
+        status_url = response.data['ai_job_url']
+        assert client.get(status_url).data['status'] == 'PENDING'
+
+        run_next_job()
+        assert run_next_job() is None
+
+        job_status = client.get(status_url).data
+        assert job_status['status'] == 'DONE'
+        assert job_status['ai_feedback'] == "Keep going!"
+        ai_module = Module.objects.get(id=job_status['module_id'])
+        assert (ai_module.source_module_id, ai_module.reinforcement_type) == (unit.module.id, 'THEORY')
+        assert generated == [['a', 'c', 'd']]
+
+    def test_failed_generation_is_reported(self, client, user, unit, exercises, monkeypatch):
+        from MeetFlowV1.services import AIService
+        from MeetFlowV1.jobs import run_next_job
+
+        def fail(module, exercise_type, error_log):
+            raise Exception("LLM unavailable")
+
+        monkeypatch.setattr(AIService, "get_adaptive_feedback", lambda exercise, error_log, **kwargs: "Keep going!")
+        monkeypatch.setattr(AIService, "_generate_reinforcement_content", fail)
+
+        for answer in ['a', 'c', 'd']:
+            response = client.post(f'/api/exercises/{exercises[0].id}/check/', {'answer': answer}, format='json')
+
+        run_next_job()
+        job_status = client.get(response.data['ai_job_url']).data
+        assert job_status['status'] == 'DONE'
+        assert job_status['ai_feedback'] == "Keep going!"
+        assert job_status['module_id'] is None
+        assert job_status['error'] == "Reinforcement failed: LLM unavailable"
+
+    def test_job_llm_calls_run_concurrently_under_a_deadline(self, client, user, unit, exercises, monkeypatch, settings):
+        import threading
+        from MeetFlowV1.services import AIService, FEEDBACK_FALLBACK
+        from MeetFlowV1.jobs import run_next_job
+
+        # Both calls must be in flight at the same time to get past the barrier
+        both_started = threading.Barrier(2, timeout=5)
+        release = threading.Event()
+
+        def stuck_feedback(exercise, error_log, **kwargs):
+            both_started.wait()
+            release.wait(10)
+            return "Too late"
+
+        def content(module, exercise_type, error_log):
+            both_started.wait()
+            return self.MOCK_REINFORCEMENT
+
+        settings.AI_JOB_DEADLINE = 1
+        monkeypatch.setattr(AIService, "get_adaptive_feedback", stuck_feedback)
+        monkeypatch.setattr(AIService, "_generate_reinforcement_content", content)
+
+        for answer in ['a', 'c', 'd']:
+            client.post(f'/api/exercises/{exercises[0].id}/check/', {'answer': answer}, format='json')
+
+        try:
+            job = run_next_job()
+        finally:
+            release.set()
+
+        # The feedback can only return once released: the job gave up on it instead of waiting
+        assert not both_started.broken
+        assert job.feedback == FEEDBACK_FALLBACK
+        assert job.result_module is not None
+        assert job.error == "Feedback timed out"
+
+    def test_feedback_is_streamed_as_server_sent_events(self, client, user, unit, exercises, monkeypatch):
+        from MeetFlowV1.models import ReinforcementJob
+        from MeetFlowV1.services import AIService
+
+        monkeypatch.setattr(AIService, "_stream_llm", lambda messages, **kwargs: iter(["Keep ", "going!"]))
+        stream_url = f'/api/exercises/{exercises[0].id}/feedback/stream/'
+
+        assert client.get(stream_url, HTTP_ACCEPT='text/event-stream').status_code == 403
+
+        for answer in ['a', 'c', 'd']:
+            response = client.post(
+                f'/api/exercises/{exercises[0].id}/check/', {'answer': answer, 'stream_feedback': True}, format='json'
+            )
+        assert response.data['ai_feedback_url'] == stream_url
+        assert ReinforcementJob.objects.get().include_feedback is False
+
+        response = client.get(stream_url, HTTP_ACCEPT='text/event-stream')
+        assert response['Content-Type'] == 'text/event-stream'
+        body = b''.join(response.streaming_content).decode()
+        assert body == (
+            'data: {"delta": "Keep "}\n\n'
+            'data: {"delta": "going!"}\n\n'
+            'event: done\ndata: {}\n\n'
+        )
+
+    def test_jobs_for_the_same_exercise_share_one_generation(self, unit, exercises, monkeypatch, settings):
+        from MeetFlowV1.services import AIService
+        from MeetFlowV1.jobs import enqueue_reinforcement_job, run_next_job
+
+        generated = []
+        monkeypatch.setattr(AIService, "get_adaptive_feedback", lambda exercise, error_log, **kwargs: "Keep going!")
+        monkeypatch.setattr(
+            AIService, "_generate_reinforcement_content",
+            lambda module, exercise_type, error_log: generated.append(list(error_log)) or self.MOCK_REINFORCEMENT
+        )
+
+        settings.AI_BATCH_WINDOW = 0.1
+        students = [User.objects.create_user(username=f"student{idx}", password="password") for idx in range(3)]
+        jobs = [
+            enqueue_reinforcement_job(student, exercises[0], unit.module, [f"error {idx}"])
+            for idx, student in enumerate(students)
+        ]
+
+        run_next_job()
+        assert run_next_job() is None
+        assert generated == [["error 0", "error 1", "error 2"]]
+
+        for job, student in zip(jobs, students):
+            job.refresh_from_db()
+            assert job.status == 'DONE'
+            assert job.result_module.user == student
+
+    def test_active_job_is_reused_for_further_failures(self, client, user, unit, exercises):
+        from MeetFlowV1.models import ReinforcementJob
+
+        job_ids = []
+        for answer in ['a', 'c', 'd', 'e']:
+            response = client.post(f'/api/exercises/{exercises[0].id}/check/', {'answer': answer}, format='json')
+            job_ids.append(response.data['ai_job_id'])
+
+        assert job_ids[2] is not None and job_ids[2] == job_ids[3]
+        job = ReinforcementJob.objects.get()
+        assert job.error_log == ['a', 'c', 'd', 'e']
+
+    def test_each_failed_exercise_gets_its_own_feedback(self, client, user, unit, exercises, monkeypatch, settings):
+        from MeetFlowV1.services import AIService
+        from MeetFlowV1.jobs import run_next_job
+
+        feedback_calls = []
+        generated = []
+
+        def feedback(exercise, error_log, **kwargs):
+            feedback_calls.append((exercise.id, list(error_log)))
+            return f"About {exercise.id}"
+
+        monkeypatch.setattr(AIService, "get_adaptive_feedback", feedback)
+        monkeypatch.setattr(
+            AIService, "_generate_reinforcement_content",
+            lambda module, exercise_type, error_log: generated.append(list(error_log)) or self.MOCK_REINFORCEMENT
+        )
+
+        job_ids = {}
+        for exercise, answers in zip(exercises, [['a', 'c', 'd'], ['x', 'y', 'z']]):
+            for answer in answers:
+                response = client.post(f'/api/exercises/{exercise.id}/check/', {'answer': answer}, format='json')
+            job_ids[exercise.id] = response.data['ai_job_id']
+        assert len(set(job_ids.values())) == 2
+
+        settings.AI_BATCH_WINDOW = 0.1
+        run_next_job()
+        assert run_next_job() is None
+
+        first, second = exercises
+        assert sorted(feedback_calls) == [(first.id, ['a', 'c', 'd']), (second.id, ['x', 'y', 'z'])]
+        for exercise_id, job_id in job_ids.items():
+            assert client.get(f'/api/reinforcement_jobs/{job_id}/').data['ai_feedback'] == f"About {exercise_id}"
+        # The reinforcement module of the module and exercise type is still generated once
+        assert len(generated) == 1
+        assert Module.objects.filter(user=user, source_module=unit.module, is_ai_generated=True).count() == 1
+
+    def test_one_generation_per_module_and_type_across_workers(self, user, unit, exercises, monkeypatch, settings):
+        from MeetFlowV1.services import AIService
+        from MeetFlowV1.jobs import enqueue_reinforcement_job, claim_next_job, run_next_job, process_job
+
+        generated = []
+        monkeypatch.setattr(AIService, "get_adaptive_feedback", lambda exercise, error_log, **kwargs: "Keep going!")
+        monkeypatch.setattr(
+            AIService, "_generate_reinforcement_content",
+            lambda module, exercise_type, error_log: generated.append(exercise_type) or self.MOCK_REINFORCEMENT
+        )
+
+        # No batching: each failed exercise is claimed on its own
+        settings.AI_BATCH_WINDOW = 0
+        first_job, second_job = [enqueue_reinforcement_job(user, exercise, unit.module, ["a"]) for exercise in exercises]
+        assert claim_next_job() == first_job
+
+        # Another worker takes the second exercise while the first one is still generating
+        run_next_job()
+        second_job.refresh_from_db()
+        assert second_job.status == 'DONE'
+        assert second_job.feedback == "Keep going!"
+        assert second_job.result_module is None
+        assert generated == []
+
+        process_job(first_job)
+        assert first_job.result_module is not None
+        assert generated == ['THEORY']
+        assert Module.objects.filter(user=user, source_module=unit.module, is_ai_generated=True).count() == 1
+
+    def test_generation_is_not_starved_by_a_large_batch(self, unit, exercises, monkeypatch, settings):
+        import threading
+        from MeetFlowV1.services import AIService, FEEDBACK_FALLBACK
+        from MeetFlowV1.jobs import enqueue_reinforcement_job, run_next_job
+
+        release = threading.Event()
+        monkeypatch.setattr(
+            AIService, "get_adaptive_feedback", lambda exercise, error_log, **kwargs: release.wait(5) and "Too late"
+        )
+        monkeypatch.setattr(
+            AIService, "_generate_reinforcement_content", lambda module, exercise_type, error_log: self.MOCK_REINFORCEMENT
+        )
+
+        # More feedback calls than fan-out threads, all stuck past the deadline
+        settings.AI_JOB_DEADLINE = 0.5
+        settings.AI_BATCH_WINDOW = 0.1
+        students = User.objects.bulk_create(
+            [User(username=f"student{idx}") for idx in range(3 * settings.AI_FANOUT_WORKERS)]
+        )
+        jobs = [enqueue_reinforcement_job(student, exercises[0], unit.module, ["a"]) for student in students]
+        try:
+            run_next_job()
+        finally:
+            release.set()
+
+        for job, student in zip(jobs, students):
+            job.refresh_from_db()
+            assert job.status == 'DONE'
+            assert job.feedback == FEEDBACK_FALLBACK
+            assert job.error == "Feedback timed out"
+            assert job.result_module.user == student
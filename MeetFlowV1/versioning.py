@@ -0,0 +1,99 @@
+import re
+import threading
+import time
+from django.db import connection
+from .models import VersionCounter
+
+CURRICULUM_VERSION_KEY = 'curriculum'
+PROGRESS_VERSION_KEY = 'progress:{user_id}'
+# Shape of get_map_version(): "<curriculum version>-<progress version>"
+MAP_VERSION_RE = re.compile(r'[0-9]{1,20}-[0-9]{1,20}')
+
+# Curriculum version seen by the current request (or job) of each thread
+_local = threading.local()
+
+
+def _new_version():
+    # Counters start from (and jump to) a timestamp so a recreated counter, or a bump
+    # that was rolled back, never hands out a value that was already handed out.
+    return time.time_ns()
+
+
+def _read_versions(keys):
+    versions = dict(VersionCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        VersionCounter.objects.bulk_create(
+            [VersionCounter(key=key, value=_new_version()) for key in missing], ignore_conflicts=True
+        )
+        versions.update(VersionCounter.objects.filter(key__in=missing).values_list('key', 'value'))
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    """
+    Increments a VersionCounter in one statement, inside the surrounding transaction:
+    other processes see the new version exactly when they can see the writes it stands for.
+    """
+    table = connection.ops.quote_name(VersionCounter._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ("key", "value") VALUES (%s, %s) '
+            f'ON CONFLICT ("key") DO UPDATE SET "value" = CASE WHEN excluded."value" > {table}."value" '
+            f'THEN excluded."value" ELSE {table}."value" + 1 END',
+            [key, _new_version()]
+        )
+
+
+def get_curriculum_version():
+    """
+    Read from the database once per request (or reinforcement job) and thread, so
+    every lookup of the request sees the same curriculum; bumps made by the thread
+    itself are seen immediately.
+    """
+    version = getattr(_local, 'curriculum_version', None)
+    if version is None:
+        version = _local.curriculum_version = _read_versions([CURRICULUM_VERSION_KEY])[0]
+    return version
+
+
+def forget_curriculum_version():
+    """
+    Makes the next get_curriculum_version() of this thread read the database again.
+    """
+    _local.curriculum_version = None
+
+
+def bump_curriculum_version():
+    _bump(CURRICULUM_VERSION_KEY)
+    forget_curriculum_version()
+
+
+def get_progress_version(user_id):
+    # Bumped by web requests and by the reinforcement worker alike: read from the database
+    return _read_versions([PROGRESS_VERSION_KEY.format(user_id=user_id)])[0]
+
+
+def bump_progress_version(user_id):
+    _bump(PROGRESS_VERSION_KEY.format(user_id=user_id))
+
+
+def get_map_version(user_id):
+    """
+    Combined version tag of a user's map: changes whenever the curriculum or the user's progress changes.
+    """
+    progress_key = PROGRESS_VERSION_KEY.format(user_id=user_id)
+    curriculum_version = getattr(_local, 'curriculum_version', None)
+    if curriculum_version is None:
+        curriculum_version, progress_version = _read_versions([CURRICULUM_VERSION_KEY, progress_key])
+        _local.curriculum_version = curriculum_version
+    else:
+        progress_version = _read_versions([progress_key])[0]
+    return f"{curriculum_version}-{progress_version}"
+
+
+def is_map_version(value):
+    """
+    Whether a client-supplied value looks like a map version (and is therefore safe in a cache key).
+    """
+    return bool(MAP_VERSION_RE.fullmatch(value))
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.http import (
+    HttpResponse,
     JsonResponse,
+    StreamingHttpResponse,
     HttpResponseForbidden,
     HttpResponseNotFound,
 )
@@ -8,6 +11,9 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags, quote_etag
 from django.db.models import Q
 import json
 
@@ -15,6 +21,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status as rest_status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 from .models import (
     Module,
@@ -22,8 +29,8 @@ from .models import (
     Unit,
     MasterExercise,
     AIExercise,
-    ModuleDependency,
     UserExerciseAttempt,
+    ReinforcementJob,
 )
 from .serializers import (
     ModuleSerializer,
@@ -37,15 +44,50 @@ from .serializers import (
 from .services import (
     validate_exercise_response,
     is_module_unlocked,
+    resolve_module_states,
+    reinforcement_display_id,
     update_user_progress,
+    record_exercise_completion,
+    record_failed_attempt,
+    AI_FLAG_THRESHOLD,
     generate_ai_lesson,
     ExerciseEvaluator,
     AIService,
 )
+from .jobs import enqueue_reinforcement_job
+from .metrics import render_metrics
+from .versioning import get_map_version, is_map_version
+from .map_cache import get_map_snapshot, store_map_snapshot, diff_map_payload
+from .graph import get_curriculum_graph
 
 User = get_user_model()
 
 
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets EventSource clients (Accept: text/event-stream) through content negotiation;
+    errors are sent as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode()
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    LLM and reinforcement metrics in the Prometheus text format.
+    """
+    authorization = request.headers.get("Authorization", "")
+    has_token = bool(settings.METRICS_TOKEN) and constant_time_compare(authorization, f"Bearer {settings.METRICS_TOKEN}")
+    if not has_token and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @csrf_exempt
 def login_view(request):
     if request.method == "POST":
@@ -208,22 +250,58 @@ def check_session(request):
 class MapProgressView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @extend_schema(
+        summary="Get the learning map",
+        description=(
+            "Returns the nodes and edges of the user's map with a strong ETag. "
+            "Answers 304 when If-None-Match matches the current version. "
+            "With ?since=<version> only the nodes/edges that changed since that version are returned."
+        ),
+        parameters=[OpenApiParameter('since', OpenApiTypes.STR, OpenApiParameter.QUERY, required=False)],
+        responses={200: OpenApiTypes.OBJECT}
+    )
     def get(self, request):
+        # The version only lives in the cache: a matching ETag is answered without touching the ORM
+        version = get_map_version(request.user.id)
+        etag = quote_etag(version)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=rest_status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        # Serve the materialized snapshot until the user's progress or the curriculum changes
+        payload = get_map_snapshot(request.user.id, version)
+        if payload is None:
+            payload = self._build_payload(request)
+            store_map_snapshot(request.user.id, version, payload)
+
+        data = {**payload, 'version': version}
+        since = request.query_params.get('since')
+        # Malformed, unknown or expired versions fall back to the full payload
+        if since and is_map_version(since):
+            previous = get_map_snapshot(request.user.id, since)
+            if previous is not None:
+                data = {**diff_map_payload(previous, payload), 'version': version, 'since': since}
+
+        return Response(data, headers={'ETag': etag})
+
+    def _build_payload(self, request):
         # 1. Get modules: master (user=None) + user-specific AI modules
-        modules_qs = Module.objects.filter(Q(user=None) | Q(user=request.user))
-        serializer = ModuleSerializer(modules_qs, many=True, context={'request': request})
+        modules_qs = Module.objects.filter(
+            Q(user=None) | Q(user=request.user)
+        ).select_related('unit').prefetch_related('outgoing_dependencies')
+        modules = list(modules_qs)
+
+        graph = get_curriculum_graph()
+        user_graph = graph.for_user(request.user)
+
+        # Status and completion of the whole graph in a fixed number of queries
+        module_states = resolve_module_states(request.user, modules, user_graph)
+        serializer = ModuleSerializer(
+            modules, many=True, context={'request': request, 'module_states': module_states}
+        )
         
         # Pre-process modules
         master_modules = {str(m['id']): m for m in serializer.data if not m['is_ai_generated']}
-        ai_modules = [m for m in serializer.data if m['is_ai_generated']]
-        
-        # Mapping for reinforcement types to sub-indices
-        TYPE_INDEX = {
-            'BLANKS': 1,
-            'PARSONS': 2,
-            'DEBUG': 3,
-            'CODE': 4
-        }
+        ai_modules = {str(m['id']): m for m in serializer.data if m['is_ai_generated']}
         
         # Mapping from database ID to display ID (e.g., "2" -> "2", "50" -> "2.1")
         id_map = {}
@@ -232,87 +310,50 @@ class MapProgressView(APIView):
             # If the user wants master nodes to be numbered by their order:
             # id_map[mod_id] = str(mod['order'])
         
-        for ai_mod in ai_modules:
-            source_id = str(ai_mod.get('source_module'))
-            sub_idx = TYPE_INDEX.get(ai_mod.get('reinforcement_type'), 0)
-            # Display ID format: "SourceID.SubIndex"
-            id_map[str(ai_mod['id'])] = f"{source_id}.{sub_idx}"
+        for mod_id, ai_mod in ai_modules.items():
+            # Display ID ("SourceID.SubIndex") is stored at injection time
+            id_map[mod_id] = ai_mod['display_id'] or reinforcement_display_id(
+                ai_mod.get('source_module'), ai_mod.get('reinforcement_type')
+            )
 
-        # 2. Format nodes for React Flow
+        # 2. Format nodes for React Flow (AI node positions are stored at injection time)
         nodes = []
-        
-        # Add master nodes
-        for mod_id, mod in master_modules.items():
+        for mod_id, mod in {**master_modules, **ai_modules}.items():
             nodes.append(self._format_node(mod, id_map[mod_id]))
 
-        # Add AI nodes with dynamic positioning
-        for ai_mod in ai_modules:
-            source_db_id = str(ai_mod.get('source_module'))
-            if source_db_id in master_modules:
-                source_mod = master_modules[source_db_id]
-                
-                # Find the next master module(s)
-                next_master_deps = ModuleDependency.objects.filter(source_node_id=source_db_id, user=None)
-                if next_master_deps.exists():
-                    target_db_id = str(next_master_deps.first().target_node_id)
-                    if target_db_id in master_modules:
-                        target_mod = master_modules[target_db_id]
-                        
-                        mid_x = (source_mod['position_x'] + target_mod['position_x']) / 2
-                        mid_y = (source_mod['position_y'] + target_mod['position_y']) / 2
-                        
-                        offset_map = {'BLANKS': -60, 'PARSONS': -20, 'DEBUG': 20, 'CODE': 60}
-                        offset_y = offset_map.get(ai_mod.get('reinforcement_type'), 0)
-                        
-                        ai_mod['position_x'] = mid_x
-                        ai_mod['position_y'] = mid_y + offset_y
-                else:
-                    ai_mod['position_x'] = source_mod['position_x'] + 100
-                    ai_mod['position_y'] = source_mod['position_y'] + 50
-
-            nodes.append(self._format_node(ai_mod, id_map[str(ai_mod['id'])]))
-
         # 3. Build connections (edges for React Flow) 
         connections = []
-        dependencies = ModuleDependency.objects.filter(Q(user=None) | Q(user=request.user))
+        # (source, target, is_ai_edge): master edges first, then the user's AI overlay
+        dependencies = [(source_id, target_id, False) for source_id, target_id in graph.edges]
+        dependencies += [(source_id, target_id, True) for source_id, target_id in user_graph.edges]
         
-        # Identify direct master edges bypassed by AI
-        bypassed_edges = {}
-        for ai_mod in ai_modules:
-            source_db_id = str(ai_mod.get('source_module'))
-            if source_db_id:
-                if source_db_id not in bypassed_edges:
-                    bypassed_edges[source_db_id] = set()
-                
-                ai_outgoing = ModuleDependency.objects.filter(source_node_id=ai_mod['id'], user=request.user)
-                for out_dep in ai_outgoing:
-                    bypassed_edges[source_db_id].add(str(out_dep.target_node_id))
+        # Direct master edges bypassed by AI modules (recorded on the AI edges at injection time)
+        bypassed_edges = {
+            (bypassed_source_id, target_id)
+            for (_, target_id), (_, bypassed_source_id) in user_graph.edge_details.items()
+            if bypassed_source_id
+        }
 
-        for dep in dependencies:
-            source_db_id = str(dep.source_node_id)
-            target_db_id = str(dep.target_node_id)
-            
+        for source_node_id, target_node_id, is_ai_edge in dependencies:
             # Skip direct master edges if an AI bypass exists
-            if dep.user is None and source_db_id in bypassed_edges and target_db_id in bypassed_edges[source_db_id]:
+            if not is_ai_edge and (source_node_id, target_node_id) in bypassed_edges:
                 continue
 
             # Map DB IDs to Display IDs for the edge
-            display_source = id_map.get(source_db_id)
-            display_target = id_map.get(target_db_id)
+            display_source = id_map.get(str(source_node_id))
+            display_target = id_map.get(str(target_node_id))
             
             if not display_source or not display_target:
                 continue
 
             edge_id = f"e{display_source}-{display_target}"
-            is_ai_edge = dep.user is not None
             
             label = None
             if is_ai_edge:
-                target_mod = Module.objects.filter(id=dep.target_node_id).first()
-                if target_mod and target_mod.is_ai_generated:
-                    label = f"Reinforcement: {target_mod.reinforcement_type}"
-                else:
-                    label = "AI Reinforcement"
+                label = user_graph.edge_details[(source_node_id, target_node_id)][0]
+                if not label:
+                    target_mod = ai_modules.get(str(target_node_id))
+                    label = f"Reinforcement: {target_mod['reinforcement_type']}" if target_mod else "AI Reinforcement"
 
             connections.append({
                 'id': edge_id,
@@ -323,10 +364,10 @@ class MapProgressView(APIView):
                 'label': label
             })
         
-        return Response({
+        return {
             'nodes': nodes,
             'edges': connections
-        })
+        }
 
     def _format_node(self, mod, display_id):
         return {
@@ -365,43 +406,23 @@ class ExerciseSubmitView(APIView):
         
         if is_ai:
             exercise = get_object_or_404(AIExercise, id=exercise_id)
-            attempt, created = UserExerciseAttempt.objects.get_or_create(
-                user=request.user, ai_exercise=exercise
-            )
             unit = exercise.source_unit
         else:
             exercise = get_object_or_404(MasterExercise, id=exercise_id)
-            attempt, created = UserExerciseAttempt.objects.get_or_create(
-                user=request.user, master_exercise=exercise
-            )
             unit = exercise.unit
             
         module_id = unit.module_id
         is_correct, explanation = validate_exercise_response(exercise_id, request.data, is_ai=is_ai)
         
         if is_correct:
-            attempt.is_completed = True
-            attempt.save()
-            
             # Rigorous check: verify if ALL exercises of the current type (Master or AI) 
             # in this unit are completed before marking the module as COMPLETED.
-            if is_ai:
-                total = AIExercise.objects.filter(source_unit=unit, user=request.user).count()
-                completed = AIExercise.objects.filter(
-                    source_unit=unit,
-                    user=request.user,
-                    attempts__user=request.user,
-                    attempts__is_completed=True
-                ).distinct().count()
-            else:
-                total = MasterExercise.objects.filter(unit=unit).count()
-                completed = MasterExercise.objects.filter(
-                    unit=unit,
-                    attempts__user=request.user,
-                    attempts__is_completed=True
-                ).distinct().count()
-
-            if total > 0 and completed >= total:
+            # Answered by the per-unit completion counter of the user's progress row.
+            unit_completed = record_exercise_completion(
+                request.user, exercise, unit, is_ai=is_ai, answer=user_response
+            )
+
+            if unit_completed:
                 update_user_progress(request.user, module_id, exercises_completed=True)
             
             return Response({
@@ -411,8 +432,7 @@ class ExerciseSubmitView(APIView):
                 'is_completed': True
             })
         else:
-            attempt.attempts_count += 1
-            attempt.save()
+            record_failed_attempt(request.user, exercise, is_ai=is_ai, error_entry=user_response)
             return Response({
                 'correct': False,
                 'message': 'Incorrect answer.',
@@ -464,7 +484,7 @@ class ExerciseCheckView(APIView):
 
     @extend_schema(
         summary="Submit exercise response",
-        description="Validates the user's response. If it fails 3 times, triggers AI reinforcement and marks progress as STUCK.",
+        description="Validates the user's response. If it fails 3 times, marks progress as STUCK and queues AI reinforcement; poll ai_job_url for the injected module and stream the feedback from ai_feedback_url (send stream_feedback=true to skip it in the job).",
         request=OpenApiTypes.OBJECT,
         responses={200: OpenApiTypes.OBJECT}
     )
@@ -475,15 +495,9 @@ class ExerciseCheckView(APIView):
         if is_ai:
             exercise = get_object_or_404(AIExercise, id=exercise_id)
             unit = exercise.source_unit
-            attempt, created = UserExerciseAttempt.objects.get_or_create(
-                user=request.user, ai_exercise=exercise
-            )
         else:
             exercise = get_object_or_404(MasterExercise, id=exercise_id)
             unit = exercise.unit
-            attempt, created = UserExerciseAttempt.objects.get_or_create(
-                user=request.user, master_exercise=exercise
-            )
         
         # Security check: Is the module unlocked for this user?
         if not is_module_unlocked(request.user, unit.module):
@@ -496,28 +510,15 @@ class ExerciseCheckView(APIView):
         is_correct, explanation = ExerciseEvaluator.evaluate(exercise, user_payload)
         
         if is_correct:
-            attempt.is_completed = True
-            attempt.save()
-            
             # Rigorous check: verify if ALL exercises of the current type (Master or AI) 
             # in this unit are completed before marking the module as COMPLETED.
-            if is_ai:
-                total = AIExercise.objects.filter(source_unit=unit, user=request.user).count()
-                completed = AIExercise.objects.filter(
-                    source_unit=unit,
-                    user=request.user,
-                    attempts__user=request.user,
-                    attempts__is_completed=True
-                ).distinct().count()
-            else:
-                total = MasterExercise.objects.filter(unit=unit).count()
-                completed = MasterExercise.objects.filter(
-                    unit=unit,
-                    attempts__user=request.user,
-                    attempts__is_completed=True
-                ).distinct().count()
+            # Answered by the per-unit completion counter of the user's progress row.
+            unit_completed = record_exercise_completion(
+                request.user, exercise, unit, is_ai=is_ai,
+                answer=user_payload.get('answer') or user_payload.get('response')
+            )
             
-            if total > 0 and completed >= total:
+            if unit_completed:
                 update_user_progress(request.user, unit.module_id, exercises_completed=True)
 
             return Response({
@@ -527,21 +528,21 @@ class ExerciseCheckView(APIView):
                 'is_completed': True
             })
         else:
-            attempt.attempts_count += 1
-            if not attempt.error_log:
-                attempt.error_log = []
-            
-            # Store the answer or the error_log in the attempt's history
-            attempt.error_log.append(
-                user_payload.get('answer') or 
-                user_payload.get('response') or 
-                user_payload.get('error_log')
+            # Atomic increment + history append; returns the new attempt count
+            attempt = record_failed_attempt(
+                request.user,
+                exercise,
+                is_ai=is_ai,
+                error_entry=(
+                    user_payload.get('answer') or 
+                    user_payload.get('response') or 
+                    user_payload.get('error_log')
+                )
             )
             
-            ai_feedback = ""
-            if attempt.attempts_count >= 3:
-                attempt.is_flagged_for_ai = True
-                
+            ai_job = None
+            ai_feedback_url = None
+            if attempt.attempts_count >= AI_FLAG_THRESHOLD:
                 # Check current status: if COMPLETED, it's review mode, don't mark STUCK or generate module
                 current_progress = UserModuleProgress.objects.filter(
                     user=request.user, 
@@ -554,25 +555,95 @@ class ExerciseCheckView(APIView):
                     # Mark as STUCK in progress
                     update_user_progress(request.user, unit.module_id, is_stuck=True)
                 
-                ai_feedback = AIService.get_adaptive_feedback(exercise, attempt.error_log)
-                
+                # Feedback and reinforcement are generated by the worker (run_reinforcement_worker)
                 # ONLY generate reinforcement modules for MASTER exercises
                 # to avoid infinite loops of AI generating AI.
                 # AND only if not in review mode.
-                if not is_ai and not is_review_mode:
-                    # Generate adaptive reinforcement module and inject in graph
-                    AIService.inject_reinforcement_module(request.user, unit.module, exercise.type, attempt.error_log)
+                inject_module = not is_ai and not is_review_mode
+                # Clients reading ai_feedback_url do not need the worker to generate the feedback too
+                stream_feedback = ExerciseEvaluator._to_bool(user_payload.get('stream_feedback', False))
+                if inject_module or not stream_feedback:
+                    ai_job = enqueue_reinforcement_job(
+                        request.user, exercise, unit.module, attempt.error_log,
+                        is_ai=is_ai,
+                        inject_module=inject_module,
+                        include_feedback=not stream_feedback
+                    )
+
+                ai_feedback_url = reverse('exercise_feedback_stream', args=[exercise.id])
+                if is_ai:
+                    ai_feedback_url += '?is_ai=true'
             
-            attempt.save()
             return Response({
                 'correct': False,
                 'message': 'Incorrect.',
                 'explanation': explanation,
-                'ai_feedback': ai_feedback,
+                'ai_feedback': "",
+                'ai_feedback_url': ai_feedback_url,
+                'ai_job_id': ai_job.id if ai_job else None,
+                'ai_job_url': reverse('reinforcement_job_status', args=[ai_job.id]) if ai_job else None,
                 'flagged_for_ai': attempt.is_flagged_for_ai
             })
 
 
+class ExerciseFeedbackStreamView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    @extend_schema(
+        summary="Stream adaptive AI feedback",
+        description="Server-Sent Events stream of the adaptive feedback for an exercise the user failed 3 times. Each `data:` event carries a `delta` with the next tokens; a final `done` event closes the stream.",
+        parameters=[OpenApiParameter("is_ai", OpenApiTypes.BOOL, description="The exercise is an AI exercise")],
+        responses={200: OpenApiTypes.STR}
+    )
+    def get(self, request, exercise_id):
+        is_ai = ExerciseEvaluator._to_bool(request.query_params.get('is_ai', False))
+        if is_ai:
+            exercise = get_object_or_404(AIExercise, id=exercise_id)
+            attempt = UserExerciseAttempt.objects.filter(user=request.user, ai_exercise=exercise).first()
+        else:
+            exercise = get_object_or_404(MasterExercise, id=exercise_id)
+            attempt = UserExerciseAttempt.objects.filter(user=request.user, master_exercise=exercise).first()
+
+        if attempt is None or not attempt.is_flagged_for_ai:
+            return Response(
+                {"error": f"Feedback is available after {AI_FLAG_THRESHOLD} failed attempts."},
+                status=403
+            )
+
+        def event_stream():
+            for delta in AIService.stream_adaptive_feedback(exercise, attempt.error_log):
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies (nginx) from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class ReinforcementJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Get AI reinforcement job status",
+        description="Reports the status of a queued AI reinforcement job (PENDING, RUNNING, DONE, FAILED), its adaptive feedback and the injected module once available.",
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    def get(self, request, job_id):
+        job = get_object_or_404(ReinforcementJob, id=job_id, user=request.user)
+        return Response({
+            'id': job.id,
+            'status': job.status,
+            'ai_feedback': job.feedback,
+            'module_id': job.result_module_id,
+            'error': job.error or None,
+            'created_at': job.created_at,
+            'updated_at': job.updated_at
+        })
+
+
 class UserStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
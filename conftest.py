@@ -0,0 +1,12 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from MeetFlowV1.versioning import forget_curriculum_version
+
+    # Map snapshots and the curriculum version seen by this thread must not leak between tests
+    cache.clear()
+    forget_curriculum_version()
+    yield